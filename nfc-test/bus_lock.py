@@ -0,0 +1,62 @@
+# I2C bus 1 lock shared with the OLED scripts
+# dashboard.py and UPSMonitor.py drive the display through an I2C broker that
+# takes a flock around every batch of transactions (see
+# oled-test/OLED_Stats/i2c_broker.py). LockedI2C wraps a busio.I2C so that
+# adafruit_pn532's I2CDevice takes the same locks around each of its
+# transactions, as urgent work:
+#   flock(LOCK_PATH + ".urgent", LOCK_EX), flock(LOCK_PATH, LOCK_EX), release
+#   the ".urgent" lock, do the transaction, release LOCK_PATH
+# Holding ".urgent" while waiting keeps display batches from queueing up
+# ahead of the PN532, so it waits for at most the batch on the bus.
+# LOCK_PATH, OLED_I2C_LOCK and the temp dir fallback must match i2c_broker.
+import os
+import fcntl
+import tempfile
+
+LOCK_PATH = os.environ.get("OLED_I2C_LOCK", "/run/lock/oled-stats-i2c-1.lock")
+URGENT_SUFFIX = ".urgent"
+
+
+# Read-only file descriptor for flock(), creating the file for everyone.
+# Without /run/lock (e.g. in a container) the lock lives in the temp dir.
+def _open_lock(path):
+    for candidate in (path, os.path.join(tempfile.gettempdir(), os.path.basename(path))):
+        try:
+            fd = os.open(candidate, os.O_RDONLY | os.O_CREAT, 0o666)
+        except OSError:
+            continue
+        try:
+            os.fchmod(fd, 0o666)  # past the umask, so other users can create it too
+        except OSError:
+            pass  # someone else's file, readable is all flock needs
+        return fd
+    raise OSError("can't open I2C lock file " + path)
+
+
+class LockedI2C:
+    def __init__(self, i2c, lock_path=LOCK_PATH):
+        self.i2c = i2c
+        self._lock_fd = _open_lock(lock_path)
+        self._urgent_fd = _open_lock(lock_path + URGENT_SUFFIX)
+
+    # Blocks for the other processes' locks, then tries the bus itself
+    def try_lock(self):
+        fcntl.flock(self._urgent_fd, fcntl.LOCK_EX)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        finally:
+            fcntl.flock(self._urgent_fd, fcntl.LOCK_UN)
+        if self.i2c.try_lock():
+            return True
+        fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        return False
+
+    def unlock(self):
+        try:
+            self.i2c.unlock()
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # writeto(), readfrom_into(), scan() and the rest go straight to the bus
+    def __getattr__(self, name):
+        return getattr(self.i2c, name)
@@ -2,13 +2,15 @@ import board
 import busio
 from digitalio import DigitalInOut
 from adafruit_pn532.i2c import PN532_I2C
+from bus_lock import LockedI2C
 import RPi.GPIO as GPIO
 import time
 
 LED_PIN = 17  # GPIO pin connected to LED
 
 # Initialize I2C communication
-i2c = busio.I2C(board.SCL, board.SDA)
+# The OLED scripts share the bus, so go through the shared bus lock like read.py
+i2c = LockedI2C(busio.I2C(board.SCL, board.SDA))
 pn532 = PN532_I2C(i2c, debug=False)
 
 GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
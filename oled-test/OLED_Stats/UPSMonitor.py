@@ -6,11 +6,12 @@ import time
 import board
 import busio
 import gpiozero
-import struct
-import smbus
 from PIL import Image, ImageDraw, ImageFont
-import adafruit_ssd1306
-import subprocess
+from text_cache import TextCache
+import ssd1306_fast  # adafruit_ssd1306 with skip-unchanged and dirty-window show()
+from collector import Collector, GB
+from ups import UpsSampler, PowerMonitor
+from i2c_broker import I2CBroker, BrokerI2C, PRIORITY_URGENT, PRIORITY_BULK, LOCK_PATH
 
 # Define the Reset Pin using gpiozero
 oled_reset = gpiozero.OutputDevice(4, active_high=False)  # GPIO 4 (D4) used for reset
@@ -23,14 +24,21 @@ BORDER = 5
 # Switch between displays every 5 seconds
 LOOPTIME = 5.0
 
-i2c = board.I2C()
+# Seconds on battery before a clean shutdown, None to only show the power loss
+SHUTDOWN_AFTER = None
+
+# The display and the UPS gauge share bus 1 with other processes (NFC reader),
+# so all traffic goes through a broker on the shared bus lock file
+broker = I2CBroker(board.I2C(), lock_path=LOCK_PATH)
+broker.start()
+i2c = BrokerI2C(broker, "oled", PRIORITY_BULK, split=128)
 oled_reset.on()
 time.sleep(0.1)
 oled_reset.off()
 time.sleep(0.1)
 oled_reset.on()
 
-oled = adafruit_ssd1306.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
+oled = ssd1306_fast.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
 
 oled.fill(0)
 oled.show()
@@ -46,75 +54,84 @@ x = 0
 font = ImageFont.truetype('PixelOperator.ttf', 16)
 icon_font = ImageFont.truetype('lineawesome-webfont.ttf', 18)
 
-# UPS Setup
-bus = smbus.SMBus(1)
-address = 0x36
+# Glyphs and icons are rasterized once and pasted from the cache on every frame
+text_cache = TextCache()
+text_cache.preload(icon_font, [chr(62609), chr(62776), chr(63426), chr(62171), chr(61931),
+                                chr(61926), chr(0xf071), chr(62018), chr(62020), chr(61671)])
+text_cache.preload(font, "0123456789.%/: ")
 
-# Get UPS parameters
-def readVoltage():
-    read = bus.read_word_data(address, 2)
-    swapped = struct.unpack("<H", struct.pack(">H", read))[0]
-    return swapped * 1.25 / 1000 / 16
+# System metrics from /proc and /sys, no shell pipelines
+stats = Collector()
 
-def readCapacity():
-    read = bus.read_word_data(address, 4)
-    swapped = struct.unpack("<H", struct.pack(">H", read))[0]
-    return swapped / 256
+# UPS Setup
+# The fuel gauge is sampled on its own thread, the loop only reads the latest values
+ups_sampler = UpsSampler(bus=BrokerI2C(broker, "ups", PRIORITY_URGENT), address=0x36, interval=2.0)
+ups_sampler.sample()
+ups_sampler.start()
 
 def get_ups_status(voltage, ac_power):
     return "Plugged In" if ac_power else "Power Loss"
 
 display_mode = 0  # Toggle between 0 (System Stats) and 1 (UPS Info)
 
-# GPIO pin 6 used for power status detection
-ups_power_status_pin = gpiozero.DigitalInputDevice(6)  
+# GPIO pin 6 used for power status detection, watched with edge callbacks
+power = PowerMonitor(6, sampler=ups_sampler, shutdown_after=SHUTDOWN_AFTER)
 
 while True:
     draw.rectangle((0, 0, width, height), outline=0, fill=0)
 
     if display_mode == 0:
         # System Stats Screen
-        IP = subprocess.check_output("hostname -I | cut -d' ' -f1", shell=True).strip().decode()
-        CPU = subprocess.check_output("top -bn1 | grep load | awk '{printf \"%.2fLA\", $(NF-2)}'", shell=True).strip().decode()
-        MemUsage = subprocess.check_output("free -m | awk 'NR==2{printf \"%.2f%%\", $3*100/$2 }'", shell=True).strip().decode()
-        Disk = subprocess.check_output("df -h | awk '$NF==\"/\"{printf \"%d/%dGB\", $3,$2}'", shell=True).strip().decode()
-        Temperature = subprocess.check_output("vcgencmd measure_temp | cut -d '=' -f2", shell=True).strip().decode()
-
-        draw.text((x, top + 5), chr(62609), font=icon_font, fill=255)
-        draw.text((x + 65, top + 5), chr(62776), font=icon_font, fill=255)
-        draw.text((x, top + 25), chr(63426), font=icon_font, fill=255)
-        draw.text((x + 65, top + 25), chr(62171), font=icon_font, fill=255)
-        draw.text((x, top + 45), chr(61931), font=icon_font, fill=255)
-
-        draw.text((x + 19, top + 5), Temperature, font=font, fill=255)
-        draw.text((x + 87, top + 5), MemUsage, font=font, fill=255)
-        draw.text((x + 19, top + 25), Disk, font=font, fill=255)
-        draw.text((x + 87, top + 25), CPU, font=font, fill=255)
-        draw.text((x + 19, top + 45), IP, font=font, fill=255)
+        IP = stats.ip()
+        CPU = "%.2fLA" % stats.loadavg()[0]
+        used, total = stats.memory()
+        MemUsage = "%.2f%%" % (used * 100 / total)
+        used, total, _ = stats.disk()
+        Disk = "%d/%dGB" % ((used + GB - 1) // GB, (total + GB - 1) // GB)
+        Temperature = "%.1f'C" % stats.temperature()
+
+        text_cache.draw(image, (x, top + 5), chr(62609), icon_font)
+        text_cache.draw(image, (x + 65, top + 5), chr(62776), icon_font)
+        text_cache.draw(image, (x, top + 25), chr(63426), icon_font)
+        text_cache.draw(image, (x + 65, top + 25), chr(62171), icon_font)
+        text_cache.draw(image, (x, top + 45), chr(61931), icon_font)
+
+        text_cache.draw(image, (x + 19, top + 5), Temperature, font)
+        text_cache.draw(image, (x + 87, top + 5), MemUsage, font)
+        text_cache.draw(image, (x + 19, top + 25), Disk, font)
+        text_cache.draw(image, (x + 87, top + 25), CPU, font)
+        text_cache.draw(image, (x + 19, top + 45), IP, font)
     
     else:
         # UPS Info Screen
-        voltage = readVoltage()
-        capacity = readCapacity()
+        voltage, capacity = ups_sampler.read()
+        if voltage is None:  # gauge not read successfully yet
+            voltage = capacity = 0.0
         
-        ac_power = ups_power_status_pin.is_active  # Check if the GPIO pin for UPS status is high (plugged in)
+        ac_power = power.ac_power  # GPIO pin for UPS status is high when plugged in
         ups_status = get_ups_status(voltage, ac_power)
 
         ups_icon = chr(61926) if ac_power else chr(0xf071)
         battery_icon = chr(62018) if capacity > 50 else chr(62020)
         bolt_icon = chr(61671)
 
-        draw.text((x + 10, top + 5), ups_icon, font=icon_font, fill=255)
-        draw.text((x + 35, top + 5), ups_status, font=font, fill=255)
+        text_cache.draw(image, (x + 10, top + 5), ups_icon, icon_font)
+        text_cache.draw(image, (x + 35, top + 5), ups_status, font, static=True)
 
-        draw.text((x + 20, top + 25), battery_icon, font=icon_font, fill=255)
-        draw.text((x + 45, top + 25), f"{capacity:.1f}%", font=font, fill=255)
+        text_cache.draw(image, (x + 20, top + 25), battery_icon, icon_font)
+        text_cache.draw(image, (x + 45, top + 25), f"{capacity:.1f}%", font)
 
-        draw.text((x + 20, top + 45), bolt_icon, font=icon_font, fill=255)
-        draw.text((x + 45, top + 45), f"{voltage:.2f}V", font=font, fill=255)
+        text_cache.draw(image, (x + 20, top + 45), bolt_icon, icon_font)
+        text_cache.draw(image, (x + 45, top + 45), f"{voltage:.2f}V", font)
     
     oled.image(image)
     oled.show()
-    
-    time.sleep(LOOPTIME)
-    display_mode = 1 - display_mode
+    if display_mode == 1:
+        power.frame_shown()
+
+    # Next screen after LOOPTIME, or the UPS screen right away when the power changes
+    if power.changed.wait(LOOPTIME):
+        power.changed.clear()
+        display_mode = 1
+    else:
+        display_mode = 1 - display_mode
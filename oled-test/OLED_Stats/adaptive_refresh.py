@@ -0,0 +1,103 @@
+# Adaptive refresh and idle power save for the dashboard
+# Redrawing every LOOPTIME wakes the Pi and the I2C bus once a second even
+# when every value on the screen is the same as last time. AdaptiveRefresh
+# decides how long the dashboard sleeps between frames instead: each frame
+# is compared with the one before it, and while fewer than `threshold`
+# pixels change the interval grows by `backoff` up to `slow`. A significant
+# change goes straight back to `fast`, and so does activity(), which the
+# dashboard calls on a button press or a power-loss event.
+#
+# Without activity the panel is dimmed to `dim_contrast` after `dim_after`
+# seconds and switched off after `off_after` seconds (None disables either);
+# while it is off nothing is drawn at all. Works with adafruit_ssd1306 style
+# displays (contrast(), poweroff(), poweron()) and luma devices (contrast(),
+# hide(), show()).
+import time
+
+ON = "on"
+DIM = "dim"
+OFF = "off"
+
+
+class AdaptiveRefresh:
+    def __init__(self, fast=1.0, slow=10.0, backoff=1.5, threshold=24, dim_after=None, off_after=None,
+                 dim_contrast=1, contrast=0xFF):
+        self.fast = fast
+        self.slow = max(slow, fast)
+        self.backoff = backoff
+        self.threshold = threshold  # changed pixels that count as a significant change
+        self.dim_after = dim_after
+        self.off_after = off_after
+        self.dim_contrast = dim_contrast
+        self.contrast = contrast
+        self.interval = fast
+        self.state = ON
+        self.changed = 0  # pixels changed by the last frame
+        self.wakeups = 0
+        self.started = self.last_activity = time.monotonic()
+        self._previous = None
+
+    # Compare the bytes of a drawn frame (1 bit per pixel) with the previous
+    # one and adjust the interval, returns the number of changed pixels
+    def frame(self, frame):
+        data = int.from_bytes(frame, "big")
+        if self._previous is None:
+            self.changed = 0
+        else:
+            self.changed = bin(data ^ self._previous).count("1")
+            if self.changed >= self.threshold:
+                self.interval = self.fast
+            else:
+                self.interval = min(self.interval * self.backoff, self.slow)
+        self._previous = data
+        return self.changed
+
+    # Start comparing from the next frame, e.g. after a page switch
+    def reset(self):
+        self._previous = None
+
+    # A button press or an event worth looking at: refresh fast, panel on
+    def activity(self):
+        self.interval = self.fast
+        self.last_activity = time.monotonic()
+
+    def wakeup(self):
+        self.wakeups += 1
+
+    # The panel state for the time since the last activity
+    def target_state(self, now=None):
+        idle = (time.monotonic() if now is None else now) - self.last_activity
+        if self.off_after is not None and idle >= self.off_after:
+            return OFF
+        if self.dim_after is not None and idle >= self.dim_after:
+            return DIM
+        return ON
+
+    # Seconds until the panel state changes without activity, None if never
+    def until_state_change(self, now=None):
+        idle = (time.monotonic() if now is None else now) - self.last_activity
+        left = [after - idle for after in (self.dim_after, self.off_after) if after is not None and idle < after]
+        return min(left) if left else None
+
+    # Switch the panel to the target state; returns True if it changed
+    def apply(self, device, now=None):
+        state = self.target_state(now)
+        if state == self.state:
+            return False
+        luma = hasattr(device, "hide")
+        if state == OFF:
+            device.hide() if luma else device.poweroff()
+        else:
+            if self.state == OFF:
+                device.show() if luma else device.poweron()
+            device.contrast(self.dim_contrast if state == DIM else self.contrast)
+        self.state = state
+        return True
+
+    def wakeups_per_hour(self, now=None):
+        elapsed = (time.monotonic() if now is None else now) - self.started
+        return self.wakeups * 3600 / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        return {"state": self.state, "interval": round(self.interval, 2), "wakeups": self.wakeups,
+                "wakeups_per_hour": round(self.wakeups_per_hour())}
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# CPU time per refresh: shell pipelines vs. the in-process collector
+# Runs the same set of metrics monitor.py shows, both the old way (one
+# subprocess.check_output per metric) and through collector.Collector, and
+# prints the user+system CPU time per refresh including forked children.
+#
+# Usage: python3 bench_collector.py [refreshes]
+import os
+import sys
+import time
+import subprocess
+
+from collector import Collector, GB
+
+SHELL_COMMANDS = (
+    "hostname -I | cut -d' ' -f1 | head --bytes -1",
+    "top -bn1 | grep load | awk '{printf \"%.2fLA\", $(NF-2)}'",
+    "free -m | awk 'NR==2{printf \"%.2f%%\", $3*100/$2 }'",
+    "df -h | awk '$NF==\"/\"{printf \"%d/%dGB\", $3,$2}'",
+    "cat /sys/class/thermal/thermal_zone*/temp | awk -v CONVFMT='%.1f' '{printf $1/1000}'",
+)
+
+
+def refresh_shell():
+    for cmd in SHELL_COMMANDS:
+        subprocess.check_output(cmd, shell=True, stderr=subprocess.DEVNULL)
+
+
+def refresh_collector(stats):
+    stats.ip()
+    "%.2fLA" % stats.loadavg()[0]
+    used, total = stats.memory()
+    "%.2f%%" % (used * 100 / total)
+    used, total, _ = stats.disk()
+    "%d/%dGB" % ((used + GB - 1) // GB, (total + GB - 1) // GB)
+    try:
+        "%.1f" % stats.temperature()
+    except OSError:
+        pass  # no thermal zone (e.g. inside a container)
+
+
+# Run `func` n times, return (cpu ms, wall ms) per call, children included
+def measure(func, n):
+    t0 = os.times()
+    w0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    w1 = time.perf_counter()
+    t1 = os.times()
+    cpu = (t1.user - t0.user) + (t1.system - t0.system) \
+        + (t1.children_user - t0.children_user) + (t1.children_system - t0.children_system)
+    return cpu * 1000 / n, (w1 - w0) * 1000 / n
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    stats = Collector()
+
+    shell_cpu, shell_wall = measure(refresh_shell, n)
+    coll_cpu, coll_wall = measure(lambda: refresh_collector(stats), n * 20)
+    stats.close()
+
+    print("refreshes: %d" % n)
+    print("%-12s %10s %10s" % ("", "cpu ms", "wall ms"))
+    print("%-12s %10.3f %10.3f" % ("shell", shell_cpu, shell_wall))
+    print("%-12s %10.3f %10.3f" % ("collector", coll_cpu, coll_wall))
+    if coll_cpu > 0:
+        print("speedup (cpu): %.0fx" % (shell_cpu / coll_cpu))
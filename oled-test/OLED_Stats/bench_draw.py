@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Micro-benchmark for the drawing primitives on a 128x64 MVLSB buffer:
+# adafruit_framebuf's per-pixel loops vs. framebuf_fast's page-wise
+# fill_rect() (behind fill_rect, hline, vline and rect), batched circle() and
+# inlined line(). The same random shapes are drawn with both on the same
+# random background, and the buffers are checked to be bit-identical.
+#
+# Usage: python3 bench_draw.py [shapes]
+import sys
+import time
+import random
+
+import adafruit_framebuf
+import framebuf_fast
+
+WIDTH = 128
+HEIGHT = 64
+
+
+def make_shapes(count):
+    shapes = {name: [] for name in ("fill_rect", "hline", "vline", "rect", "circle", "line")}
+    for _ in range(count):
+        x = random.randrange(-8, WIDTH)
+        y = random.randrange(-8, HEIGHT)
+        color = random.randrange(2)
+        shapes["fill_rect"].append((x, y, random.randrange(1, 64), random.randrange(1, 40), color))
+        shapes["hline"].append((x, y, random.randrange(1, WIDTH), color))
+        shapes["vline"].append((x, y, random.randrange(1, HEIGHT), color))
+        shapes["rect"].append((x, y, random.randrange(1, 64), random.randrange(1, 40), color))
+        shapes["circle"].append((x, y, random.randrange(1, 32), color))
+        shapes["line"].append((x, y, random.randrange(-8, WIDTH + 8), random.randrange(-8, HEIGHT + 8), color))
+    return shapes
+
+
+def run(cls, background, name, calls):
+    fb = cls(bytearray(background), WIDTH, HEIGHT, adafruit_framebuf.MVLSB)
+    draw = getattr(fb, name)
+    start = time.perf_counter()
+    for args in calls:
+        draw(*args)
+    return len(calls) / (time.perf_counter() - start), bytes(fb.buf)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    shapes = make_shapes(count)
+    background = bytes(random.randrange(256) for _ in range(WIDTH * HEIGHT // 8))
+    print("%-10s %14s %14s %9s" % ("primitive", "pixel calls/s", "fast calls/s", "speedup"))
+    for name, calls in shapes.items():
+        slow, slow_buf = run(adafruit_framebuf.FrameBuffer, background, name, calls)
+        fast, fast_buf = run(framebuf_fast.FrameBuffer, background, name, calls)
+        assert slow_buf == fast_buf, name + ": fast path is not bit-identical"
+        print("%-10s %14.0f %14.0f %8.1fx" % (name, slow, fast, fast / slow))
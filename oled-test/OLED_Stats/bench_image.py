@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Micro-benchmark for FrameBuffer.image(): adafruit_framebuf pixel loop vs.
+# framebuf_fast bulk packing, at 128x64 and 128x32. Every frame is also
+# checked to be bit-identical between the two.
+#
+# Usage: python3 bench_image.py [frames]
+import sys
+import time
+import random
+
+import adafruit_framebuf
+import framebuf_fast
+from PIL import Image, ImageDraw, ImageFont
+
+
+def make_frames(width, height, count):
+    font = ImageFont.load_default()
+    frames = []
+    for i in range(count):
+        image = Image.new("1", (width, height))
+        draw = ImageDraw.Draw(image)
+        for row in range(0, height, 16):
+            draw.text((random.randrange(8), row), "CPU %d%% %d" % (i, random.randrange(1000)),
+                      font=font, fill=255)
+        draw.rectangle((width - 20, 2, width - 2, height - 2), outline=255)
+        frames.append(image)
+    return frames
+
+
+def run(cls, fmt, frames, width, height):
+    fb = cls(bytearray(width * height // 8), width, height, fmt)
+    start = time.perf_counter()
+    out = []
+    for image in frames:
+        fb.image(image)
+        out.append(bytes(fb.buf))
+    return (time.perf_counter() - start) * 1000 / len(frames), out
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print("%-10s %-6s %12s %12s %9s" % ("size", "format", "pixel ms", "fast ms", "speedup"))
+    for width, height in ((128, 64), (128, 32)):
+        frames = make_frames(width, height, count)
+        for name, fmt in (("MVLSB", adafruit_framebuf.MVLSB), ("MHMSB", adafruit_framebuf.MHMSB)):
+            slow, slow_out = run(adafruit_framebuf.FrameBuffer, fmt, frames, width, height)
+            fast, fast_out = run(framebuf_fast.FrameBuffer, fmt, frames, width, height)
+            assert slow_out == fast_out, "fast path is not bit-identical"
+            print("%-10s %-6s %12.3f %12.3f %8.0fx" % ("%dx%d" % (width, height), name,
+                                                      slow, fast, slow / fast))
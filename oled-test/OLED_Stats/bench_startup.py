@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Startup time of `import board`: full platform detection vs platform_cache
+# Every run is a fresh interpreter, as when a stats script starts. "cold"
+# imports board the usual way, so adafruit_platformdetect probes the system;
+# "cached" loads the BLINKA_FORCE* variables from platform_cache's file first
+# (the file is written before the timed runs). Prints the median and the
+# fastest time of the import itself and of the whole process, and the time
+# of the detection probe alone, which is what the cache saves.
+#
+# Usage: python3 bench_startup.py [runs]
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+import platform_cache
+
+COLD = """
+import time
+start = time.perf_counter()
+import board
+print((time.perf_counter() - start) * 1000)
+"""
+
+CACHED = """
+import time
+start = time.perf_counter()
+import platform_cache
+platform_cache.load(%r)
+import board
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+PROBE = """
+import time
+from adafruit_platformdetect import Detector
+start = time.perf_counter()
+detector = Detector()
+detector.chip.id, detector.board.id
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+# (import ms, process ms) for every run of `code`
+def measure(code, env, runs):
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, "-c", code], env=env,
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        results.append((float(output), (time.perf_counter() - start) * 1000))
+    return results
+
+
+def summary(results):
+    imports = sorted(r[0] for r in results)
+    process = sorted(r[1] for r in results)
+    middle = len(results) // 2
+    return imports[middle], imports[0], process[middle], process[0]
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    env = {key: value for key, value in os.environ.items() if key not in platform_cache.VARIABLES}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "platform.env")
+        subprocess.check_call([sys.executable, "-c", "import platform_cache; platform_cache.load(%r)" % path],
+                              env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        print("platform: %s" % platform_cache.read_env(path))
+        cold = summary(measure(COLD, env, runs))
+        cached = summary(measure(CACHED % path, env, runs))
+        probe = summary(measure(PROBE, env, runs))
+
+    print("%-8s %16s %16s %16s %16s" % ("", "import p50 ms", "import min ms", "process p50 ms", "process min ms"))
+    for name, result in (("cold", cold), ("cached", cached)):
+        print("%-8s %16.1f %16.1f %16.1f %16.1f" % ((name,) + result))
+    print("detection probe alone: p50 %.1f ms, min %.1f ms" % probe[:2])
+    print("import board %.1fx faster with the cache" % (cold[0] / cached[0]))
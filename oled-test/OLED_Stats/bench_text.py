@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Micro-benchmark for text drawing: ImageDraw.text() vs. text_cache's cached
+# bitmaps, with the stats screens' font and strings at every anchor they use
+# and at even and odd x. Every string is also checked to be pixel-identical
+# between the two.
+#
+# Usage: python3 bench_text.py [rounds]
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from text_cache import TextCache
+
+FONT = "PixelOperator.ttf"
+STRINGS = (["%.2f%%" % (i * 1.37) for i in range(73)] + ["%d/%dGB" % (i, 32) for i in range(0, 99, 7)]
+           + ["%.1f'C" % (30 + i * 0.7) for i in range(40)] + ["Plugged In", "Power Loss", "192.168.1.23"])
+
+
+def run(draw_text, anchor, rounds):
+    out = []
+    image = Image.new("1", (128, 32))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        out.clear()
+        for text in STRINGS:
+            for x in (63, 64):
+                image.paste(0, (0, 0) + image.size)
+                draw_text(image, (x, 5), text, anchor)
+                out.append(image.tobytes())
+    return (time.perf_counter() - start) * 1e6 / (rounds * len(out)), out
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    font = ImageFont.truetype(FONT, 16)
+    cache = TextCache()
+
+    def pil(image, xy, text, anchor):
+        ImageDraw.Draw(image).text(xy, text, font=font, fill=255, anchor=anchor)
+
+    def cached(image, xy, text, anchor):
+        cache.draw(image, xy, text, font, anchor=anchor)
+
+    print("%-7s %12s %12s %9s" % ("anchor", "PIL us", "cached us", "speedup"))
+    for anchor in ("la", "ma", "ra"):
+        slow, slow_out = run(pil, anchor, rounds)
+        fast, fast_out = run(cached, anchor, rounds)
+        assert slow_out == fast_out, anchor + ": cached text is not pixel-identical"
+        print("%-7s %12.1f %12.1f %8.1fx" % (anchor, slow, fast, slow / fast))
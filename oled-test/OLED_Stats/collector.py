@@ -0,0 +1,177 @@
+# Fork-free system metrics for the OLED stats scripts
+# Reads /proc, /sys and statvfs directly instead of starting a shell pipeline
+# (hostname, top, free, df, cat) for every value on every refresh.
+# The /proc and /sys files are opened once and re-read with os.pread(), so a
+# refresh costs a handful of syscalls and no fork/exec at all.
+import os
+import time
+import socket
+import struct
+import fcntl
+import threading
+from collections import deque
+
+KB = 1024
+MB = KB * 1024
+GB = MB * 1024
+
+SIOCGIFADDR = 0x8915
+
+
+class Collector:
+    def __init__(self, disk_path="/", thermal_zone=0):
+        self.disk_path = disk_path
+        self.thermal_path = "/sys/class/thermal/thermal_zone{0}/temp".format(thermal_zone)
+        self._fds = {}
+        self._sock = None
+
+    # Keep every file descriptor open and rewind with pread on each read.
+    # procfs/sysfs regenerate the contents when read from offset 0.
+    def _read(self, path, size=4096):
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+            self._fds[path] = fd
+        return os.pread(fd, size, 0)
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    # First IPv4 address that is not on the loopback interface,
+    # same as `hostname -I | cut -d' ' -f1`
+    def ip(self):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for _, name in socket.if_nameindex():
+            if name == "lo":
+                continue
+            try:
+                req = struct.pack("256s", name.encode()[:15])
+                res = fcntl.ioctl(self._sock.fileno(), SIOCGIFADDR, req)
+            except OSError:
+                continue  # interface is down or has no IPv4 address
+            return socket.inet_ntoa(res[20:24])
+        return ""
+
+    # Received and transmitted bytes summed over all interfaces except loopback
+    def net_bytes(self):
+        rx = tx = 0
+        for line in self._read("/proc/net/dev", 16384).splitlines()[2:]:
+            name, _, fields = line.partition(b":")
+            if name.strip() == b"lo":
+                continue
+            fields = fields.split()
+            rx += int(fields[0])
+            tx += int(fields[8])
+        return rx, tx
+
+    # 1, 5 and 15 minute load averages
+    def loadavg(self):
+        fields = self._read("/proc/loadavg").split()
+        return float(fields[0]), float(fields[1]), float(fields[2])
+
+    # /proc/meminfo as a dict of kB values
+    def meminfo(self):
+        info = {}
+        for line in self._read("/proc/meminfo").splitlines():
+            key, _, value = line.partition(b":")
+            info[key.decode()] = int(value.split()[0])
+        return info
+
+    # Used and total memory in bytes, used = MemTotal - MemAvailable as in `free`
+    def memory(self):
+        info = self.meminfo()
+        total = info["MemTotal"] * KB
+        available = info.get("MemAvailable", info["MemFree"]) * KB
+        return total - available, total
+
+    # Jiffy counters from /proc/stat: the aggregate "cpu" line first,
+    # followed by one tuple per core ("cpu0", "cpu1", ...)
+    def cpu_times(self):
+        times = []
+        for line in self._read("/proc/stat", 16384).splitlines():
+            if not line.startswith(b"cpu"):
+                break
+            times.append(tuple(int(v) for v in line.split()[1:]))
+        return times
+
+    # Used bytes, total bytes and use% of the root filesystem, as reported by `df`
+    def disk(self):
+        st = os.statvfs(self.disk_path)
+        total = st.f_blocks * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        # df leaves the reserved blocks out of the percentage and rounds up
+        usable = used + st.f_bavail * st.f_frsize
+        percent = -(-used * 100 // usable) if usable else 0
+        return used, total, percent
+
+    # SoC temperature in degrees Celsius
+    def temperature(self):
+        return int(self._read(self.thermal_path)) / 1000
+
+    # Seconds since boot
+    def uptime(self):
+        return float(self._read("/proc/uptime").split()[0])
+
+
+# Busy percentage between two /proc/stat samples of one cpu line.
+# idle and iowait (fields 4 and 5) count as idle time, guest time is
+# already included in user/nice so it is left out of the total.
+def busy_percent(old, new):
+    delta = [n - o for o, n in zip(old[:8], new[:8])]
+    total = sum(delta)
+    if total <= 0:
+        return 0.0
+    return 100.0 * (total - delta[3] - delta[4]) / total
+
+
+# Background CPU usage sampler
+# Takes a /proc/stat snapshot every `interval` seconds and keeps the ones that
+# fall inside the last `window` seconds, so percent() and per_core() return
+# the usage over that window immediately instead of blocking like `vmstat 4 2`.
+# The sampling window and the display refresh rate are independent.
+class CpuSampler(threading.Thread):
+    def __init__(self, collector=None, interval=0.5, window=4.0):
+        super().__init__(name="CpuSampler", daemon=True)
+        self.collector = collector or Collector()
+        self.interval = interval
+        self.window = window
+        self._samples = deque()
+        self._percent = 0.0
+        self._per_core = []
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            self.sample()
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+
+    # Take one snapshot and update the results, also usable without the thread
+    def sample(self):
+        now = time.monotonic()
+        self._samples.append((now, self.collector.cpu_times()))
+        # Drop snapshots older than the window, but always keep two
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+        if len(self._samples) < 2:
+            return
+        old = self._samples[0][1]
+        new = self._samples[-1][1]
+        self._percent = busy_percent(old[0], new[0])
+        self._per_core = [busy_percent(o, n) for o, n in zip(old[1:], new[1:])]
+
+    # Aggregate usage of all cores in percent
+    def percent(self):
+        return self._percent
+
+    # Usage of each core in percent, cpu0 first
+    def per_core(self):
+        return list(self._per_core)
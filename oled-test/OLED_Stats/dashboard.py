@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# Single-process OLED dashboard
+# Replaces running one of monitor.py / stats.py / psutilstats.py /
+# UPSMonitor.py at a time: the display and I2C bus are initialised once, fonts
+# are loaded once, one metrics cache serves every page, and the pages from
+# pages.py rotate on a timer without re-initialising anything.
+#
+# Usage: python3 dashboard.py [--pages system,network,ups] [--report 60]
+#   --report N prints the process CPU usage every N seconds; the time from
+#   start to the first frame is always printed.
+#   --slow, --dim-after, --off-after and --button set up the adaptive refresh
+#   and idle power save, see adaptive_refresh.py.
+#   --sync packs and sends frames in the drawing thread instead of handing
+#   them to a display_writer.DisplayWriter thread.
+#   OLED_TIMING=1 turns on per-stage frame timing, see frame_timing.py.
+import time
+
+START = time.monotonic()
+
+import os
+import sys
+import argparse
+import threading
+
+from PIL import Image, ImageDraw, ImageFont
+
+import platform_cache  # Blinka platform from the cache, before ssd1306_fast imports busio
+platform_cache.load()
+import ssd1306_fast
+import frame_timing
+from adaptive_refresh import AdaptiveRefresh, OFF
+from collector import Collector
+from display_writer import DisplayWriter
+from i2c_broker import I2CBroker, BrokerI2C, PRIORITY_BULK, LOCK_PATH
+from metrics_cache import MetricsCache
+from text_cache import TextCache
+from pages import PAGES
+
+# Display Parameters
+WIDTH = 128
+HEIGHT = 64
+
+# Display Refresh
+LOOPTIME = 1.0
+SLOWTIME = 10.0  # longest time between frames while nothing on the screen changes
+
+DEFAULT_PAGES = "system,stats,network"
+
+
+class Dashboard:
+    def __init__(self, oled, page_names, timer=None, shutdown_after=None, broker=None, writer=False,
+                 refresh=None):
+        self.timer = timer or frame_timing.NullTimer()
+        self.oled = frame_timing.instrument(oled, self.timer)
+        self.broker = broker  # I2CBroker shared by the display and the pages, if any
+        self.writer = None
+        if writer:
+            # frames are packed and sent on the writer thread while the next one is
+            # drawn; the writer ends their timer frames
+            self.writer = DisplayWriter(self.oled, self.timer)
+            self.writer.start()
+        self.image = Image.new("1", (oled.width, oled.height))
+        self.draw = ImageDraw.Draw(self.image)
+        self.font = ImageFont.truetype('PixelOperator.ttf', 16)
+        self.icon_font = ImageFont.truetype('lineawesome-webfont.ttf', 18)
+        self.text = TextCache()
+        self.text.preload(self.font, "0123456789.%/: ")
+        self.stats = Collector()
+        self.metrics = MetricsCache()
+        self.shutdown_after = shutdown_after  # seconds on UPS battery, used by the ups page
+        self.wake = threading.Event()  # set to draw the next frame without waiting
+        self.refresh = refresh  # AdaptiveRefresh policy, None for a frame every looptime
+
+        self.pages = [PAGES[name]() for name in page_names]
+        for page in self.pages:
+            page.setup(self)
+        self.index = 0
+        self.page_start = time.monotonic()
+        self.frames = 0
+        self.rendered = None  # page of the last frame drawn
+
+    # Register a metric unless another page already did
+    def metric(self, name, fetch, interval=None, default="", scaled=True):
+        if name not in self.metrics:
+            def timed_fetch():
+                with self.timer.stage("collect"):
+                    return fetch()
+            self.metrics.add(name, timed_fetch, interval=interval, default=default, scaled=scaled)
+
+    @property
+    def page(self):
+        return self.pages[self.index]
+
+    # Switch to the named page now and restart its timer
+    def show_page(self, name):
+        for index, page in enumerate(self.pages):
+            if page.name == name:
+                self.index = index
+                self.page_start = time.monotonic()
+                return True
+        return False
+
+    # Draw and transmit one frame of the current page
+    def render(self):
+        page = self.page  # show_page() may be called from other threads
+        self.timer.begin_frame()
+        if page.direct:
+            # the page draws into the framebuffer, which the writer must be done with
+            if self.writer is not None:
+                self.writer.flush()
+            with self.timer.stage("draw"):
+                page.render(self)
+            self.oled.show()
+            page.shown(self)
+            self.timer.end_frame()
+        else:
+            with self.timer.stage("draw"):
+                self.draw.rectangle((0, 0, self.oled.width, self.oled.height), outline=0, fill=0)
+                page.render(self)
+            self.present(page)
+        self.rendered = page
+        self.frames += 1
+
+    # Transmit dash.image, drawn by a PIL page
+    def present(self, page):
+        if self.writer is not None:
+            self.writer.present(self.image, lambda: page.shown(self))
+        else:
+            self.oled.image(self.image)
+            self.oled.show()
+            page.shown(self)
+            self.timer.end_frame()
+
+    def next_page(self):
+        now = time.monotonic()
+        if now - self.page_start >= self.page.duration:
+            self.index = (self.index + 1) % len(self.pages)
+            self.page_start = now
+
+    # Dim or switch off the panel when the refresh policy says so
+    def update_power(self):
+        policy = self.refresh
+        if policy.target_state() != policy.state:
+            if self.writer is not None:
+                self.writer.flush()  # let the last frame out before the panel changes
+            policy.apply(self.oled)
+
+    # Seconds to sleep before the next frame with the adaptive refresh policy,
+    # None to sleep until woken while the panel is off
+    def next_timeout(self):
+        policy = self.refresh
+        if policy.state == OFF:
+            return None
+        timeout = min(policy.interval, max(0.0, self.page.duration - (time.monotonic() - self.page_start)))
+        until_change = policy.until_state_change()
+        if until_change is not None:
+            timeout = min(timeout, until_change)
+        return timeout
+
+    def run(self, looptime=LOOPTIME, report=0):
+        self.metrics.start()
+        last_report = time.monotonic()
+        last_times = os.times()
+        policy = self.refresh
+        last_index = None
+        while True:
+            if policy is not None:
+                self.update_power()
+                if policy.state != OFF:
+                    if self.index != last_index:
+                        policy.reset()  # another page, don't count it as a change
+                        last_index = self.index
+                    self.render()
+                    policy.frame(bytes(self.oled.buf) if self.rendered.direct else self.image.tobytes())
+                    # sample the metrics less often while the screen is idle
+                    self.metrics.set_scale(policy.interval / policy.fast)
+                else:
+                    self.metrics.set_scale(policy.slow / policy.fast)
+            else:
+                self.render()
+            if self.frames == 1:
+                print("first frame after %.0f ms" % ((time.monotonic() - START) * 1000), flush=True)
+
+            now = time.monotonic()
+            if report and now - last_report >= report:
+                times = os.times()
+                cpu = (times.user - last_times.user) + (times.system - last_times.system)
+                print("cpu %.2f%%, %d frames, %s" % (cpu * 100 / (now - last_report), self.frames,
+                                                     self.oled.bus_stats()), flush=True)
+                if self.writer is not None:
+                    print("  writer %s" % self.writer.stats(), flush=True)
+                if self.metrics.errors:
+                    print("  failed fetches %s" % self.metrics.errors, flush=True)
+                if policy is not None:
+                    print("  refresh %s" % policy.stats(), flush=True)
+                if self.broker is not None:
+                    for client, stats in self.broker.report().items():
+                        print("  i2c %s: %d transactions, %d bytes, bus %.1f ms, wait max %.1f ms"
+                              % (client, stats["transactions"], stats["bytes"], stats["bus_time"] * 1000,
+                                 stats["max_wait"] * 1000), flush=True)
+                last_report, last_times = now, times
+
+            if policy is None:
+                if self.wake.wait(looptime):
+                    self.wake.clear()
+                else:
+                    self.next_page()
+                continue
+            woken = self.wake.wait(self.next_timeout())
+            policy.wakeup()
+            if woken:
+                # button press or power event: refresh fast and turn the panel back on
+                self.wake.clear()
+                policy.activity()
+            else:
+                self.next_page()
+
+
+def open_display():
+    # Imported here so Dashboard can be used without the Pi hardware libraries
+    import board
+    import gpiozero
+
+    # Define the Reset Pin using gpiozero
+    oled_reset = gpiozero.OutputDevice(4, active_high=False)  # GPIO 4 (D4) used for reset
+
+    # All I2C traffic of the dashboard goes through one broker thread; frames
+    # are sent in 128 byte chunks so UPS reads don't wait for a whole frame,
+    # and the bus lock file keeps nfc-test/read.py's traffic apart from ours
+    broker = I2CBroker(board.I2C(), lock_path=LOCK_PATH)
+    broker.start()
+    i2c = BrokerI2C(broker, "oled", PRIORITY_BULK, split=128)
+
+    # Manually reset the display (high -> low -> high for reset pulse)
+    oled_reset.on()
+    time.sleep(0.1)
+    oled_reset.off()
+    time.sleep(0.1)
+    oled_reset.on()
+
+    oled = ssd1306_fast.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
+    oled.fill(0)
+    oled.show()
+    return oled, broker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OLED stats dashboard")
+    parser.add_argument("--pages", default=DEFAULT_PAGES,
+                        help="comma separated pages to rotate through: " + ", ".join(PAGES))
+    parser.add_argument("--looptime", type=float, default=LOOPTIME,
+                        help="seconds between frames")
+    parser.add_argument("--slow", type=float, default=SLOWTIME,
+                        help="longest seconds between frames while the screen doesn't change")
+    parser.add_argument("--threshold", type=int, default=64,
+                        help="changed pixels that switch back to --looptime refresh")
+    parser.add_argument("--dim-after", type=float, default=None,
+                        help="dim the panel after this many seconds without a button press")
+    parser.add_argument("--off-after", type=float, default=None,
+                        help="switch the panel off after this many seconds without a button press")
+    parser.add_argument("--button", type=int, default=None,
+                        help="GPIO pin of a button that wakes the panel")
+    parser.add_argument("--report", type=float, default=0,
+                        help="print CPU usage every this many seconds")
+    parser.add_argument("--shutdown-after", type=float, default=None,
+                        help="with the ups page, shut down after this many seconds on battery")
+    parser.add_argument("--sync", action="store_true",
+                        help="send frames from the drawing thread, without the writer thread")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.pages.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PAGES]
+    if unknown or not names:
+        parser.error("unknown page(s): " + ", ".join(unknown) if unknown else "no pages given")
+
+    oled, broker = open_display()
+    refresh = AdaptiveRefresh(fast=args.looptime, slow=args.slow, threshold=args.threshold,
+                              dim_after=args.dim_after, off_after=args.off_after)
+    dash = Dashboard(oled, names, frame_timing.from_env(), args.shutdown_after, broker,
+                     writer=not args.sync, refresh=refresh)
+    button = None
+    if args.button is not None:
+        import gpiozero
+        button = gpiozero.Button(args.button)
+        button.when_pressed = dash.wake.set
+    try:
+        dash.run(args.looptime, args.report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if dash.writer is not None:
+            dash.writer.stop()
+        if button is not None:
+            button.close()
+        dash.oled.fill(0)
+        dash.oled.show()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# Double-buffered display writer
+# Normally a loop draws a frame and then blocks in the I2C transfer before it
+# can draw the next one. DisplayWriter moves packing and transfer to its own
+# thread: present() copies the caller's finished image (the back buffer) and
+# returns at once, and the thread transmits its copy (the front buffer) while
+# the caller draws the next frame. Only the newest frame waits: presenting
+# while one is still waiting replaces it and counts it as dropped, so the
+# display never falls behind the caller.
+#
+# Works with adafruit_ssd1306 style displays (image() + show()) and luma
+# devices (display()). An optional callback per frame runs after that frame
+# is on the display. With a frame_timing timer, present() hands the caller's
+# open frame to the writer thread, which ends it once the frame is written,
+# so pack, transfer and bus bytes are counted for the frame that caused them.
+import sys
+import threading
+
+import frame_timing
+
+
+class DisplayWriter(threading.Thread):
+    def __init__(self, device, timer=None):
+        super().__init__(name="DisplayWriter", daemon=True)
+        self.device = device
+        self.timer = timer or frame_timing.NullTimer()
+        self.presented = 0
+        self.written = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.errors = 0
+        self._pending = None  # (image, callback, timer frame) waiting for the writer
+        self._busy = False
+        self._running = True
+        self._cond = threading.Condition()
+
+    # Frames presented but not on the display yet: waiting plus being written
+    @property
+    def depth(self):
+        return (self._pending is not None) + self._busy
+
+    # A frame dropped here never reaches the bus and isn't counted by the timer
+    def present(self, image, callback=None):
+        frame = image.copy()
+        timed = self.timer.detach_frame()
+        with self._cond:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (frame, callback, timed)
+            self.presented += 1
+            self.max_depth = max(self.max_depth, self.depth)
+            self._cond.notify_all()
+
+    def _write(self, image):
+        device = self.device
+        if hasattr(device, "display"):  # luma; its show() only turns the panel on
+            device.display(image)
+        else:
+            device.image(image)
+            device.show()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                (image, callback, timed), self._pending = self._pending, None
+                self._busy = True
+            written = False
+            self.timer.attach_frame(timed)
+            try:
+                self._write(image)
+                written = True
+                if callback is not None:
+                    callback()
+            except Exception as e:
+                # keep the thread alive, the next frame may get through
+                self.errors += 1
+                print("display write failed: %r" % e, file=sys.stderr, flush=True)
+            self.timer.end_frame()
+            with self._cond:
+                self._busy = False
+                self.written += written
+                self._cond.notify_all()
+
+    # Wait until every presented frame is written or dropped
+    def flush(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.depth == 0, timeout)
+
+    # Write the last presented frame, then end the thread
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join()
+
+    def stats(self):
+        return {"presented": self.presented, "written": self.written, "dropped": self.dropped,
+                "depth": self.depth, "max_depth": self.max_depth}
@@ -0,0 +1,258 @@
+# Opt-in per-frame timing for the OLED render loop
+# Splits every frame into stages - collect (metrics), draw (PIL), pack
+# (image() into the page buffer) and transfer (show() / I2C) - and keeps the
+# last `window` samples of each in a rolling buffer, together with the bytes
+# put on the bus per frame. summary() gives p50/p95/max per stage; it is
+# printed to stderr on SIGUSR1 and optionally appended to a log file as one
+# line per interval.
+#
+# A frame may be finished on another thread than the one that began it, e.g.
+# a display writer thread: detach_frame() hands the open frame over and
+# attach_frame() continues it there, so its bytes and "frame" time include
+# the pack and transfer done by that thread. The stage samples are locked,
+# summary() may run in the signal handler while another thread records.
+#
+# Enable it with the environment, so any script can pick it up unchanged:
+#   OLED_TIMING=1                 collect timings, dump on SIGUSR1
+#   OLED_TIMING_LOG=/tmp/oled.log also write a line every interval
+#   OLED_TIMING_INTERVAL=60       log interval in seconds (default 60)
+import os
+import sys
+import time
+import signal
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+STAGES = ("collect", "draw", "pack", "transfer", "frame")
+
+
+class FrameTimer:
+    def __init__(self, window=512, log_path=None, log_interval=60.0):
+        self.samples = {name: deque(maxlen=window) for name in STAGES}
+        self.frame_bytes = deque(maxlen=window)
+        self.frames = 0
+        self.bytes_total = 0
+        self.log_path = log_path
+        self.log_interval = log_interval
+        self._frame = threading.local()  # start and bytes of the frame open on each thread
+        self._lock = threading.Lock()
+        self._last_log = time.monotonic()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.samples["frame"].maxlen)
+            samples.append(seconds)
+
+    # Bytes written to the display bus during the frame open on this thread
+    def add_bytes(self, count):
+        frame = self._frame
+        frame.bytes = getattr(frame, "bytes", 0) + count
+
+    def begin_frame(self):
+        self.attach_frame((time.perf_counter(), 0))
+
+    # Close the frame open on this thread without recording it; returns it
+    # for attach_frame() on the thread that finishes it
+    def detach_frame(self):
+        frame = self._frame
+        detached = (getattr(frame, "start", None), getattr(frame, "bytes", 0))
+        frame.start, frame.bytes = None, 0
+        return detached
+
+    def attach_frame(self, detached):
+        self._frame.start, self._frame.bytes = detached
+
+    def end_frame(self):
+        start, count = self.detach_frame()
+        if start is not None:
+            self.record("frame", time.perf_counter() - start)
+        with self._lock:
+            self.frames += 1
+            self.frame_bytes.append(count)
+            self.bytes_total += count
+        if self.log_path and time.monotonic() - self._last_log >= self.log_interval:
+            self.write_log()
+
+    # Copies of the samples, frame count and byte total, taken under the lock
+    def _snapshot(self):
+        with self._lock:
+            samples = [(name, list(values)) for name, values in self.samples.items()]
+            return samples, list(self.frame_bytes), self.frames, self.bytes_total
+
+    def summary(self):
+        samples, frame_bytes, frames, bytes_total = self._snapshot()
+        lines = ["%-9s %9s %9s %9s %7s" % ("stage", "p50 ms", "p95 ms", "max ms", "n")]
+        for name, values in samples:
+            if values:
+                p50, p95, peak = _percentiles(values)
+                lines.append("%-9s %9.2f %9.2f %9.2f %7d" % (name, p50 * 1000, p95 * 1000,
+                                                             peak * 1000, len(values)))
+        if frame_bytes:
+            p50, p95, peak = _percentiles(frame_bytes)
+            lines.append("bus bytes/frame p50 %d p95 %d max %d, total %d over %d frames"
+                         % (p50, p95, peak, bytes_total, frames))
+        return "\n".join(lines)
+
+    # One line per interval: p50/p95 of every stage in ms and the bus bytes
+    def write_log(self):
+        samples, _, frames, bytes_total = self._snapshot()
+        fields = [time.strftime("%Y-%m-%dT%H:%M:%S"), "frames=%d" % frames]
+        for name, values in samples:
+            if values:
+                p50, p95, _ = _percentiles(values)
+                fields.append("%s=%.2f/%.2f" % (name, p50 * 1000, p95 * 1000))
+        fields.append("bytes=%d" % bytes_total)
+        with open(self.log_path, "a") as log:
+            log.write(" ".join(fields) + "\n")
+        self._last_log = time.monotonic()
+
+    def install_signal(self, signum=signal.SIGUSR1):
+        def dump(*args):
+            print(self.summary(), file=sys.stderr, flush=True)
+        signal.signal(signum, dump)
+
+
+# Stand-in used when timing is off, so call sites need no conditionals
+class NullTimer:
+    frames = 0
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def record(self, name, seconds):
+        pass
+
+    def add_bytes(self, count):
+        pass
+
+    def begin_frame(self):
+        pass
+
+    def detach_frame(self):
+        return None
+
+    def attach_frame(self, detached):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def summary(self):
+        return ""
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return ordered[last * 50 // 100], ordered[last * 95 // 100], ordered[last]
+
+
+# FrameTimer configured from OLED_TIMING* environment variables, NullTimer if off
+def from_env():
+    if os.environ.get("OLED_TIMING", "") in ("", "0"):
+        return NullTimer()
+    timer = FrameTimer(log_path=os.environ.get("OLED_TIMING_LOG") or None,
+                       log_interval=float(os.environ.get("OLED_TIMING_INTERVAL", 60)))
+    timer.install_signal()
+    return timer
+
+
+# Time a display's buffer packing and bus transfer without changing its code.
+# adafruit_ssd1306 style displays: image() is "pack", show() is "transfer".
+# luma devices: display() is split into "pack" and "transfer" when the
+# device has write_spans() (sh1106_fast), otherwise all of it is "transfer";
+# write_pages()/write_spans() called directly, e.g. with pre-packed frames,
+# is "transfer".
+# Bus bytes come from the device's bytes_sent counter when it keeps one
+# (ssd1306_fast, sh1106_fast), otherwise from wrapping its low-level writes.
+def instrument(device, timer):
+    if isinstance(timer, NullTimer):
+        return device
+
+    if not hasattr(device, "bytes_sent"):
+        _count_writes(device, timer)
+
+    def timed(func, stage):
+        def wrapper(*args, **kwargs):
+            before = getattr(device, "bytes_sent", 0)
+            with timer.stage(stage):
+                result = func(*args, **kwargs)
+            timer.add_bytes(getattr(device, "bytes_sent", 0) - before)
+            return result
+        return wrapper
+
+    if hasattr(device, "show") and hasattr(device, "image") and hasattr(device, "buffer"):
+        device.image = timed(device.image, "pack")
+        device.show = timed(device.show, "transfer")
+    elif hasattr(device, "write_spans"):
+        display = device.display
+        write_spans = device.write_spans  # write_pages() and display() end up here
+        direct_write_spans = timed(write_spans, "transfer")
+        spent = [None]  # transfer time inside display(), None outside of it
+
+        def timed_write_spans(*args, **kwargs):
+            if spent[0] is None:
+                return direct_write_spans(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return write_spans(*args, **kwargs)
+            finally:
+                spent[0] += time.perf_counter() - start
+
+        def timed_display(image):
+            spent[0] = 0.0
+            before = getattr(device, "bytes_sent", 0)
+            start = time.perf_counter()
+            try:
+                display(image)
+            finally:
+                transfer, spent[0] = spent[0], None
+            timer.record("pack", time.perf_counter() - start - transfer)
+            timer.record("transfer", transfer)
+            timer.add_bytes(getattr(device, "bytes_sent", 0) - before)
+
+        device.write_spans = timed_write_spans
+        device.display = timed_display
+    else:
+        device.display = timed(device.display, "transfer")
+    return device
+
+
+# Count bytes at the bus interface of devices without a bytes_sent counter
+def _count_writes(device, timer):
+    i2c_device = getattr(device, "i2c_device", None)
+    serial = getattr(device, "_serial_interface", None)
+    if i2c_device is not None:
+        write = i2c_device.write
+
+        def counted_write(buf, *args, **kwargs):
+            timer.add_bytes(len(buf))
+            return write(buf, *args, **kwargs)
+
+        i2c_device.write = counted_write
+    elif serial is not None:
+        command = serial.command
+        data = serial.data
+
+        def counted_command(*cmd):
+            timer.add_bytes(1 + len(cmd))  # control byte + commands
+            return command(*cmd)
+
+        def counted_data(buf):
+            timer.add_bytes(len(buf) + -(-len(buf) // 32))  # control byte per block
+            return data(buf)
+
+        serial.command = counted_command
+        serial.data = counted_data
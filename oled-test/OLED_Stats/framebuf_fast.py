@@ -0,0 +1,310 @@
+# Faster drawing paths for adafruit_framebuf based displays
+# FastFrameBufferMixin goes in front of adafruit_framebuf.FrameBuffer (or a
+# subclass such as adafruit_ssd1306.SSD1306_I2C) in the class bases and
+# replaces the per-pixel Python loops with bulk byte operations. Anything it
+# can't handle falls back to the original implementation, and the resulting
+# buffer is bit-identical either way. PIL is only imported once an image is
+# drawn, so displays driven without PIL (see page_font) don't load it.
+import adafruit_framebuf
+
+# FrameBuffer.rotation -> the PIL transpose that maps the logical image onto
+# the physical buffer, same mapping as FrameBuffer.pixel()
+_ROTATIONS = {
+    0: None,
+    1: "ROTATE_270",
+    2: "ROTATE_180",
+    3: "ROTATE_90",
+}
+
+# font file name -> GlyphAtlas, see preload_font()
+_ATLASES = {}
+
+# (bit mask, color) -> bytes.translate() table that sets or clears the mask
+_MASK_TABLES = {}
+
+
+def _mask_table(mask, color):
+    table = _MASK_TABLES.get((mask, color))
+    if table is None:
+        table = _MASK_TABLES[(mask, color)] = bytes((value | mask) if color else (value & ~mask)
+                                                    for value in range(256))
+    return table
+
+
+# MVLSB with a fill_rect() that works a page (8 rows) at a time: whole pages
+# are one slice assignment, the partly covered top and bottom pages one
+# translate() of the covered columns. rect(), fill_rect(), hline() and
+# vline() of the framebuffer all end up here.
+class FastMVLSBFormat(adafruit_framebuf.MVLSBFormat):
+    @staticmethod
+    def fill_rect(framebuf, x, y, width, height, color):
+        if width < 1:
+            return
+        buf = framebuf.buf
+        stride = framebuf.stride
+        end = y + height
+        while y < end:
+            page = y >> 3
+            bottom = min(end, (page + 1) << 3)
+            mask = ((1 << (bottom - y)) - 1) << (y & 7)
+            start = page * stride + x
+            if mask == 0xFF:
+                buf[start:start + width] = (b"\xff" if color else b"\x00") * width
+            else:
+                buf[start:start + width] = bytes(buf[start:start + width]).translate(_mask_table(mask, color))
+            y = bottom
+
+
+class FastFrameBufferMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if type(self.format) is adafruit_framebuf.MVLSBFormat:
+            self.format = FastMVLSBFormat()
+
+    # One slice assignment instead of a Python loop over every byte
+    def fill(self, color):
+        if isinstance(self.format, adafruit_framebuf.MVLSBFormat) \
+                or isinstance(self.format, adafruit_framebuf.MHMSBFormat):
+            self.buf[:] = (b"\xff" if color else b"\x00") * len(self.buf)
+            return None
+        return super().fill(color)
+
+    def image(self, img):
+        width = self.width
+        height = self.height
+        if self.rotation in {1, 3}:
+            width, height = height, width
+        # other modes go to the original, which rejects them like before
+        if img.size != (width, height) or img.mode != "1" or self.stride != self.width:
+            return super().image(img)
+
+        if isinstance(self.format, adafruit_framebuf.MVLSBFormat):
+            if self.height % 8:
+                return super().image(img)
+            data = _mvlsb_bytes(_to_physical(img, self.rotation))
+            # data holds the page bytes column by column, regroup them by page
+            pages = self.height // 8
+            for page in range(pages):
+                self.buf[page * self.width:(page + 1) * self.width] = data[page::pages]
+        elif isinstance(self.format, adafruit_framebuf.MHMSBFormat):
+            if self.width % 8:
+                return super().image(img)
+            data = _to_physical(img, self.rotation).tobytes()
+            self.buf[:len(data)] = data
+        else:
+            return super().image(img)  # colour formats keep the pixel loop
+        return None
+
+    # Horizontal scrolls of MVLSB buffers move each page row with one slice
+    # copy instead of a get_pixel/set_pixel pair per pixel. Like the original,
+    # the columns scrolled away from keep their old contents.
+    def scroll(self, delta_x, delta_y):
+        width = self.width
+        if delta_y or not 0 < abs(delta_x) < width or self.stride != width \
+                or not isinstance(self.format, adafruit_framebuf.MVLSBFormat) or self.height % 8:
+            return super().scroll(delta_x, delta_y)
+        buf = self.buf
+        for start in range(0, self.height // 8 * width, width):
+            if delta_x < 0:
+                buf[start:start + width + delta_x] = buf[start - delta_x:start + width]
+            else:
+                buf[start + delta_x:start + width] = buf[start:start + width - delta_x]
+        return None
+
+    # With the font preloaded (preload_font()), lines of size 1 text at a
+    # page-aligned y in an MVLSB buffer are OR-ed (color 0: cleared) into
+    # the page row with one slice assignment per line; other cases draw
+    # pixel by pixel as before, but from the in-memory glyphs.
+    def text(self, string, x, y, color, *, font_name="font5x8.bin", size=1):
+        atlas = _ATLASES.get(font_name)
+        if atlas is None:
+            return super().text(string, x, y, color, font_name=font_name, size=size)
+        self._font = atlas
+        if size != 1 or atlas.font_height > 8 or self.rotation or self.stride != self.width \
+                or not isinstance(self.format, adafruit_framebuf.MVLSBFormat):
+            return super().text(string, x, y, color, font_name=font_name, size=size)
+
+        buf = self.buf
+        glyphs = atlas.glyphs
+        for chunk in string.split("\n"):
+            if y % 8:
+                super().text(chunk, x, y, color, font_name=font_name)
+            elif 0 <= y < self.height and chunk:
+                row = b"".join(glyphs[ord(char)] if ord(char) < 256 else atlas.blank for char in chunk)
+                first = max(0, -x)
+                end = min(len(row), self.width - x)
+                if end > first:
+                    start = y // 8 * self.stride + x + first
+                    count = end - first
+                    old = int.from_bytes(buf[start:start + count], "little")
+                    new = int.from_bytes(row[first:end], "little")
+                    value = old | new if color else old & ~new
+                    buf[start:start + count] = value.to_bytes(count, "little")
+            y += atlas.font_height
+        return None
+
+    # Same points as the original, but without a pixel() call per point:
+    # they are collected as bit masks per buffer byte and applied at the end
+    def circle(self, center_x, center_y, radius, color):
+        if self.rotation or not isinstance(self.format, FastMVLSBFormat):
+            return super().circle(center_x, center_y, radius, color)
+        width = self.width
+        height = self.height
+        stride = self.stride
+        masks = {}
+        x = radius - 1
+        y = 0
+        d_x = 1
+        d_y = 1
+        err = d_x - (radius << 1)
+        while x >= y:
+            for px, py in ((center_x + x, center_y + y), (center_x + y, center_y + x),
+                           (center_x - y, center_y + x), (center_x - x, center_y + y),
+                           (center_x - x, center_y - y), (center_x - y, center_y - x),
+                           (center_x + y, center_y - x), (center_x + x, center_y - y)):
+                if 0 <= px < width and 0 <= py < height:
+                    index = (py >> 3) * stride + px
+                    masks[index] = masks.get(index, 0) | (1 << (py & 7))
+            if err <= 0:
+                y += 1
+                err += d_y
+                d_y += 2
+            if err > 0:
+                x -= 1
+                d_x += 2
+                err += d_x - (radius << 1)
+        buf = self.buf
+        for index, mask in masks.items():
+            buf[index] = (buf[index] | mask) if color else (buf[index] & ~mask)
+        return None
+
+    # The original Bresenham steps, with the clipping and the MVLSB bit
+    # arithmetic inlined instead of a pixel() call per point
+    def line(self, x_0, y_0, x_1, y_1, color):
+        if self.rotation or not isinstance(self.format, FastMVLSBFormat):
+            return super().line(x_0, y_0, x_1, y_1, color)
+        width = self.width
+        height = self.height
+        stride = self.stride
+        buf = self.buf
+        d_x = abs(x_1 - x_0)
+        d_y = abs(y_1 - y_0)
+        x, y = x_0, y_0
+        s_x = -1 if x_0 > x_1 else 1
+        s_y = -1 if y_0 > y_1 else 1
+        steep = d_x <= d_y
+        err = (d_y if steep else d_x) / 2.0
+        while True:
+            if 0 <= x < width and 0 <= y < height:
+                index = (y >> 3) * stride + x
+                if color:
+                    buf[index] |= 1 << (y & 7)
+                else:
+                    buf[index] &= ~(1 << (y & 7))
+            if steep:
+                if y == y_1:
+                    break
+                err -= d_x
+                if err < 0:
+                    x += s_x
+                    err += d_y
+                y += s_y
+            else:
+                if x == x_1:
+                    break
+                err -= d_y
+                if err < 0:
+                    y += s_y
+                    err += d_x
+                x += s_x
+        return None
+
+    # Draw a mode "1" image with its top left corner at (x, y), replacing
+    # what is under it. Copies page bytes when y and the image height are
+    # multiples of 8 in an unrotated MVLSB buffer, sets pixels otherwise.
+    def blit_image(self, img, x=0, y=0):
+        if self.rotation:
+            pixels = img.convert("1").load()
+            for row in range(img.height):
+                for column in range(img.width):
+                    self.pixel(x + column, y + row, 1 if pixels[column, row] else 0)
+            return
+        width = min(img.width, self.width - x)
+        if width <= 0:
+            return
+        if isinstance(self.format, adafruit_framebuf.MVLSBFormat) and img.mode == "1" \
+                and not y % 8 and not img.height % 8 and x >= 0:
+            pages = img.height // 8
+            data = _mvlsb_bytes(img)
+            # pages above row 0 are skipped, a negative start would wrap
+            for page in range(max(0, -y // 8), min(pages, self.height // 8 - y // 8)):
+                start = (y // 8 + page) * self.stride + x
+                self.buf[start:start + width] = data[page::pages][:width]
+            return
+        pixels = img.convert("1").load()
+        for row in range(max(0, -y), min(img.height, self.height - y)):
+            for column in range(max(0, -x), width):
+                self.format.set_pixel(self, x + column, y + row, 1 if pixels[column, row] else 0)
+
+
+# The mode "1" image in physical buffer orientation
+def _to_physical(img, rotation):
+    from PIL import Image
+
+    transpose = _ROTATIONS[rotation]
+    if transpose is not None:
+        img = img.transpose(getattr(Image.Transpose, transpose))
+    return img
+
+
+# Pack a mode "1" image into MVLSB page bytes.
+# Transposing turns every column into a row, and the "1;R" raw mode packs
+# 8 pixels per byte with the first (topmost) pixel in bit 0, which is exactly
+# one MVLSB byte. The result is ordered column by column, page bytes within.
+def _mvlsb_bytes(img):
+    from PIL import Image
+
+    return img.transpose(Image.Transpose.TRANSPOSE).tobytes("raw", "1;R")
+
+
+# An adafruit_framebuf BitmapFont read into memory once. draw_char() takes
+# the columns from memory instead of seeking and reading the font file for
+# every column; glyphs holds each character's column bytes plus the blank
+# column that text() leaves between characters.
+class GlyphAtlas(adafruit_framebuf.BitmapFont):
+    def __init__(self, font_name="font5x8.bin"):
+        self.font_name = font_name
+        with open(font_name, "rb") as f:
+            data = f.read()
+        self.font_width, self.font_height = data[0], data[1]
+        width = self.font_width
+        if len(data) != 2 + 256 * width:
+            raise RuntimeError("Invalid font file: " + font_name)
+        mask = (1 << min(self.font_height, 8)) - 1  # rows below the font height are never drawn
+        self.glyphs = [bytes(column & mask for column in data[2 + code * width:2 + (code + 1) * width]) + b"\0"
+                       for code in range(256)]
+        self.blank = bytes(width + 1)
+
+    def deinit(self):
+        pass
+
+    def draw_char(self, char, x, y, framebuffer, color, size=1):
+        size = max(size, 1)
+        code = ord(char)
+        if code > 255:
+            return
+        for char_x, line in enumerate(self.glyphs[code][:self.font_width]):
+            for char_y in range(self.font_height):
+                if (line >> char_y) & 0x1:
+                    framebuffer.fill_rect(x + char_x * size, y + char_y * size, size, size, color)
+
+
+# Load a BitmapFont file into memory for text() of every FastFrameBufferMixin
+# framebuffer; returns the GlyphAtlas
+def preload_font(font_name="font5x8.bin"):
+    atlas = _ATLASES[font_name] = GlyphAtlas(font_name)
+    return atlas
+
+
+class FrameBuffer(FastFrameBufferMixin, adafruit_framebuf.FrameBuffer):
+    pass
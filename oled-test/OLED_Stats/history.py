@@ -0,0 +1,41 @@
+# Fixed-size metric history
+# History keeps the last `capacity` samples of one metric in an array.array
+# used as a ring buffer: 4 bytes per float sample, allocated once, so the
+# memory stays the same however long the dashboard runs. `count` keeps
+# growing with every append, which tells a reader how many samples arrived
+# since it last looked.
+from array import array
+
+
+class History:
+    def __init__(self, capacity, typecode="f"):
+        self.capacity = capacity
+        self.count = 0  # samples appended so far, including overwritten ones
+        self._data = array(typecode, [0]) * capacity
+
+    def append(self, value):
+        self._data[self.count % self.capacity] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    # Sample i of the ones held, 0 = oldest, -1 = newest
+    def __getitem__(self, i):
+        size = len(self)
+        if i < 0:
+            i += size
+        if not 0 <= i < size:
+            raise IndexError("history index out of range")
+        return self._data[(self.count - size + i) % self.capacity]
+
+    def __iter__(self):
+        return iter(self.last(len(self)))
+
+    # The newest n samples, oldest first
+    def last(self, n):
+        n = min(n, len(self))
+        end = self.count % self.capacity
+        if n <= end:
+            return self._data[end - n:end].tolist()
+        return self._data[end - n:].tolist() + self._data[:end].tolist()
@@ -0,0 +1,254 @@
+# Shared I2C bus broker
+# The OLED (0x3C), the UPS fuel gauge (0x36) and a PN532 NFC reader share I2C
+# bus 1. I2CBroker owns the bus and runs every transaction on one thread, so
+# transactions from different devices never interleave. Requests wait in a
+# priority queue: power-loss and NFC reads go ahead of display frames, and a
+# display frame is queued as short chunks, so an urgent read waits for at
+# most one small batch instead of a whole 1 KB framebuffer push. Up to
+# `batch` queued requests of the same client and priority run back to back
+# under one bus lock. Bus time, bytes and queueing delay are accounted per
+# client.
+#
+# BrokerI2C is a busio.I2C look-alike bound to one client and priority, so
+# adafruit_ssd1306, adafruit_pn532 and UpsSampler can use the broker
+# unchanged.
+#
+# Separate processes on the same bus (dashboard.py or UPSMonitor.py) each run
+# a broker with lock_path=LOCK_PATH. Any other program sharing the bus, like
+# nfc-test/read.py through nfc-test/bus_lock.py, has to follow the same flock
+# protocol around each batch of transactions:
+#   - urgent work: flock(LOCK_PATH + ".urgent", LOCK_EX), flock(LOCK_PATH,
+#     LOCK_EX), then release the ".urgent" lock, do the transactions, and
+#     release LOCK_PATH
+#   - everything else: the same with LOCK_SH on the ".urgent" file
+# While an urgent process waits for the bus it holds the ".urgent" file
+# exclusively, so no other process can queue up for the bus behind the
+# batch on it: the NFC reader waits for at most the display's current batch
+# (and one batch of each process already waiting) instead of whole frames.
+import os
+import fcntl
+import heapq
+import tempfile
+import itertools
+import threading
+import time
+
+PRIORITY_URGENT = 0  # power loss, NFC detection
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2  # display frames
+
+# flock shared by every process on I2C bus 1, OLED_I2C_LOCK to override
+LOCK_PATH = os.environ.get("OLED_I2C_LOCK", "/run/lock/oled-stats-i2c-1.lock")
+URGENT_SUFFIX = ".urgent"
+# Sleep between try_lock() attempts on a bus some other thread has locked
+LOCK_RETRY = 0.0005
+
+# SSD1306/SH1106 data write control byte; the RAM pointer carries on across
+# data writes, so a long one can be split into several shorter ones
+DATA_CONTROL = 0x40
+
+
+class _Request:
+    __slots__ = ("client", "func", "args", "nbytes", "queued", "done", "result", "error")
+
+    def __init__(self, client, func, args, nbytes):
+        self.client = client
+        self.func = func
+        self.args = args
+        self.nbytes = nbytes
+        self.queued = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ClientStats:
+    __slots__ = ("transactions", "bytes", "bus_time", "wait_time", "max_wait")
+
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.bus_time = 0.0  # seconds spent in transactions
+        self.wait_time = 0.0  # seconds spent queued
+        self.max_wait = 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# Read-only file descriptor for flock(), creating the file for everyone.
+# Without /run/lock (e.g. in a container) the lock lives in the temp dir.
+def _open_lock(path):
+    for candidate in (path, os.path.join(tempfile.gettempdir(), os.path.basename(path))):
+        try:
+            fd = os.open(candidate, os.O_RDONLY | os.O_CREAT, 0o666)
+        except OSError:
+            continue
+        try:
+            os.fchmod(fd, 0o666)  # past the umask, so other users can create it too
+        except OSError:
+            pass  # someone else's file, readable is all flock needs
+        return fd
+    raise OSError("can't open I2C lock file " + path)
+
+
+class I2CBroker(threading.Thread):
+    def __init__(self, i2c, batch=4, lock_path=None):
+        super().__init__(name="I2CBroker", daemon=True)
+        self.i2c = i2c
+        self.batch = batch
+        self.stats = {}  # client name -> ClientStats
+        self._queue = []  # heap of (priority, sequence, request)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._lock_fd = _open_lock(lock_path) if lock_path else None
+        self._urgent_fd = _open_lock(lock_path + URGENT_SUFFIX) if lock_path else None
+        self._stats_lock = threading.Lock()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    # Queue func(i2c, *args) and return the request without waiting for it
+    def submit(self, client, priority, func, *args, nbytes=0):
+        request = _Request(client, func, args, nbytes)
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._seq), request))
+            self._cond.notify()
+        return request
+
+    # Run func(i2c, *args) on the bus and return its result
+    def call(self, client, priority, func, *args, nbytes=0):
+        return self.wait(self.submit(client, priority, func, *args, nbytes=nbytes))
+
+    def wait(self, request):
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                priority, _, first = heapq.heappop(self._queue)
+                batch = [first]
+                while (len(batch) < self.batch and self._queue and self._queue[0][0] == priority
+                       and self._queue[0][2].client == first.client):
+                    batch.append(heapq.heappop(self._queue)[2])
+            self._execute(batch, priority)
+
+    # The bus flock between processes, taken through the ".urgent" gate
+    def _lock_processes(self, priority):
+        if self._lock_fd is None:
+            return
+        fcntl.flock(self._urgent_fd, fcntl.LOCK_EX if priority == PRIORITY_URGENT else fcntl.LOCK_SH)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        finally:
+            fcntl.flock(self._urgent_fd, fcntl.LOCK_UN)
+
+    def _execute(self, batch, priority=PRIORITY_NORMAL):
+        i2c = self.i2c
+        try_lock = getattr(i2c, "try_lock", None)
+        self._lock_processes(priority)
+        if try_lock is not None:
+            while not try_lock():
+                time.sleep(LOCK_RETRY)
+        try:
+            for request in batch:
+                stats = self.stats.get(request.client)
+                if stats is None:
+                    with self._stats_lock:
+                        stats = self.stats[request.client] = ClientStats()
+                start = time.monotonic()
+                try:
+                    request.result = request.func(i2c, *request.args)
+                except Exception as e:
+                    request.error = e
+                end = time.monotonic()
+                wait = start - request.queued
+                stats.transactions += 1
+                stats.bytes += request.nbytes
+                stats.bus_time += end - start
+                stats.wait_time += wait
+                stats.max_wait = max(stats.max_wait, wait)
+                request.done.set()
+        finally:
+            if try_lock is not None:
+                i2c.unlock()
+            if self._lock_fd is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # {client: {transactions, bytes, bus_time, wait_time, max_wait}}
+    def report(self):
+        with self._stats_lock:
+            stats = list(self.stats.items())
+        return {client: client_stats.as_dict() for client, client_stats in stats}
+
+
+def _writeto(i2c, address, data):
+    i2c.writeto(address, data)
+
+
+def _readfrom_into(i2c, address, buffer, start, end):
+    i2c.readfrom_into(address, buffer, start=start, end=end)
+
+
+def _writeto_then_readfrom(i2c, address, out, buffer_in, in_start, in_end):
+    i2c.writeto_then_readfrom(address, out, buffer_in, in_start=in_start, in_end=in_end)
+
+
+# busio.I2C look-alike that runs every transaction through an I2CBroker.
+# With split set, data writes (control byte 0x40) longer than `split` bytes
+# are queued as several writes so urgent clients can get in between them.
+class BrokerI2C:
+    def __init__(self, broker, client, priority=PRIORITY_NORMAL, split=None):
+        self.broker = broker
+        self.client = client
+        self.priority = priority
+        self.split = split
+        self._lock = threading.Lock()
+
+    def try_lock(self):
+        return self._lock.acquire(False)
+
+    def unlock(self):
+        self._lock.release()
+
+    def deinit(self):
+        pass
+
+    def scan(self):
+        return self.broker.call(self.client, self.priority, lambda i2c: i2c.scan())
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        data = bytes(buffer[start:end])
+        split = self.split
+        if split and len(data) > split + 1 and data[0] == DATA_CONTROL:
+            requests = []
+            for pos in range(1, len(data), split):
+                chunk = bytes((DATA_CONTROL,)) + data[pos:pos + split]
+                requests.append(self.broker.submit(self.client, self.priority, _writeto, address,
+                                                   chunk, nbytes=len(chunk)))
+            for request in requests:
+                self.broker.wait(request)
+            return
+        self.broker.call(self.client, self.priority, _writeto, address, data, nbytes=len(data))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        self.broker.call(self.client, self.priority, _readfrom_into, address, buffer, start, end,
+                         nbytes=end - start)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None,
+                              in_start=0, in_end=None):
+        out = bytes(buffer_out[out_start:out_end])
+        in_end = len(buffer_in) if in_end is None else in_end
+        self.broker.call(self.client, self.priority, _writeto_then_readfrom, address, out,
+                         buffer_in, in_start, in_end, nbytes=len(out) + in_end - in_start)
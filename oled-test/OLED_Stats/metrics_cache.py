@@ -0,0 +1,128 @@
+# Per-metric cache with its own refresh interval
+# Every metric is registered with a fetch function and an interval. A single
+# scheduler thread sleeps until the next metric is due, refreshes only that
+# one and goes back to sleep, so the IP address is looked up once a minute
+# while the CPU load is still updated every second. The display loops read
+# the latest value with get() and never sample inline. Fetches run without
+# the cache's lock, so a slow one (a DNS lookup, a bus read) delays only the
+# metrics due after it, never get() or set_scale() in the display loop.
+import sys
+import time
+import heapq
+import threading
+
+# Refresh intervals in seconds for the metrics the stats scripts show
+DEFAULT_INTERVALS = {
+    "ip": 60.0,
+    "disk": 30.0,
+    "uptime": 30.0,
+    "temp": 2.0,
+    "mem": 1.0,
+    "cpu": 1.0,
+}
+
+
+class MetricsCache:
+    def __init__(self, intervals=None):
+        self.intervals = dict(DEFAULT_INTERVALS)
+        if intervals:
+            self.intervals.update(intervals)
+        self._fetch = {}
+        self._values = {}
+        self._unscaled = set()  # metrics that keep their interval whatever the scale
+        self.errors = {}  # failed fetches per metric
+        self._queue = []  # heap of (due time, name)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.scale = 1.0  # factor on every interval, raised while the display is idle
+
+    # Register a metric and fetch it once right away so the first frame has a value.
+    # scaled=False keeps the interval fixed under set_scale(), for samples
+    # that have to be evenly spaced in time.
+    def add(self, name, fetch, interval=None, default="", scaled=True):
+        if interval is not None:
+            self.intervals[name] = interval
+        elif name not in self.intervals:
+            raise ValueError("no refresh interval for metric " + name)
+        self._fetch[name] = fetch
+        if scaled:
+            self._unscaled.discard(name)
+        else:
+            self._unscaled.add(name)
+        self._values[name] = default
+        self._refresh(name)
+        with self._cond:
+            heapq.heappush(self._queue, (time.monotonic() + self.intervals[name], name))
+            self._cond.notify()
+
+    def __contains__(self, name):
+        return name in self._fetch
+
+    def get(self, name):
+        return self._values[name]
+
+    # Fetch metrics now, outside the schedule (all of them by default)
+    def refresh(self, *names):
+        for name in names or list(self._fetch):
+            self._refresh(name)
+
+    # A failing fetch keeps the last good value and is tried again next
+    # interval; its first error is printed, later ones only counted
+    def _refresh(self, name):
+        try:
+            self._values[name] = self._fetch[name]()
+        except Exception as e:
+            count = self.errors[name] = self.errors.get(name, 0) + 1
+            if count == 1:
+                print("metric %s: fetch failed: %r" % (name, e), file=sys.stderr, flush=True)
+
+    # Stretch (scale > 1) or restore every refresh interval; when shortening,
+    # metrics that are now overdue are fetched right away
+    def set_scale(self, scale):
+        with self._cond:
+            if scale < self.scale:
+                now = time.monotonic()
+                self._queue = [(min(due, now + self._interval(name, scale)), name)
+                               for due, name in self._queue]
+                heapq.heapify(self._queue)
+                self._cond.notify()
+            self.scale = scale
+
+    def _interval(self, name, scale):
+        return self.intervals[name] * (1.0 if name in self._unscaled else scale)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="MetricsCache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Scheduler: wake only when the earliest metric is due
+    def _run(self):
+        with self._cond:
+            while self._running:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                due, name = self._queue[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+                self._cond.release()
+                try:
+                    self._refresh(name)
+                finally:
+                    self._cond.acquire()
+                # Schedule from the old due time so intervals don't drift,
+                # but don't try to catch up after a long stall
+                due += self._interval(name, self.scale)
+                heapq.heappush(self._queue, (max(due, time.monotonic()), name))
@@ -8,9 +8,11 @@ import busio
 import gpiozero
 
 from PIL import Image, ImageDraw, ImageFont
-import adafruit_ssd1306
+from text_cache import TextCache
+import ssd1306_fast  # adafruit_ssd1306 with skip-unchanged and dirty-window show()
 
-import subprocess
+from collector import Collector, GB
+from metrics_cache import MetricsCache
 
 # Define the Reset Pin using gpiozero
 oled_reset = gpiozero.OutputDevice(4, active_high=False)  # GPIO 4 (D4) used for reset
@@ -34,7 +36,7 @@ time.sleep(0.1)  # Wait for reset
 oled_reset.on()  # Turn reset pin back high
 
 # Create the OLED display object
-oled = adafruit_ssd1306.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
+oled = ssd1306_fast.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
 
 # Clear the display
 oled.fill(0)
@@ -64,50 +66,64 @@ font = ImageFont.load_default()
 font = ImageFont.truetype('PixelOperator.ttf', 16)
 icon_font = ImageFont.truetype('lineawesome-webfont.ttf', 18)
 
-while True:
-    # Draw a black filled box to clear the image
-    draw.rectangle((0, 0, width, height), outline=0, fill=0)
+# Glyphs and icons are rasterized once and pasted from the cache on every frame
+text_cache = TextCache()
+text_cache.preload(icon_font, [chr(62609), chr(62776), chr(63426), chr(62171), chr(61931)])
+text_cache.preload(font, "0123456789.%/: ")
+
+# Open /proc and /sys once, re-read them every loop
+stats = Collector()
 
-    # Shell scripts for system monitoring
-    cmd = "hostname -I | cut -d\' \' -f1 | head --bytes -1"
-    IP = subprocess.check_output(cmd, shell=True)
+def mem_usage():
+    used, total = stats.memory()
+    return "%.2f%%" % (used * 100 / total)
 
-    cmd = "top -bn1 | grep load | awk '{printf \"%.2fLA\", $(NF-2)}'"
-    CPU = subprocess.check_output(cmd, shell=True)
+def disk_usage():
+    used, total, _ = stats.disk()
+    return "%d/%dGB" % ((used + GB - 1) // GB, (total + GB - 1) // GB)
 
-    cmd = "free -m | awk 'NR==2{printf \"%.2f%%\", $3*100/$2 }'"
-    MemUsage = subprocess.check_output(cmd, shell=True)
+cache = MetricsCache()
+cache.add("ip", stats.ip)
+cache.add("cpu", lambda: "%.2fLA" % stats.loadavg()[0])
+cache.add("mem", mem_usage)
+cache.add("disk", disk_usage)
+cache.add("temp", lambda: "%.1f" % stats.temperature())
+cache.start()
 
-    cmd = "df -h | awk '$NF==\"/\"{printf \"HDD: %d/%dGB %s\", $3,$2,$5}'"
-    cmd = "df -h | awk '$NF==\"/\"{printf \"%d/%dGB\", $3,$2}'"
-    Disk = subprocess.check_output(cmd, shell=True)
+while True:
+    # Draw a black filled box to clear the image
+    draw.rectangle((0, 0, width, height), outline=0, fill=0)
 
-    cmd = "cat /sys/class/thermal/thermal_zone*/temp | awk -v CONVFMT='%.1f' '{printf $1/1000}'"
-    Temperature = subprocess.check_output(cmd, shell=True)
+    # System monitoring, latest values from the metrics cache
+    IP = cache.get("ip")
+    CPU = cache.get("cpu")
+    MemUsage = cache.get("mem")
+    Disk = cache.get("disk")
+    Temperature = cache.get("temp")
 
     # Icons
     # Icon temperature
-    draw.text((x, top + 5), chr(62609), font=icon_font, fill=255)
+    text_cache.draw(image, (x, top + 5), chr(62609), icon_font)
     # Icon memory
-    draw.text((x + 65, top + 5), chr(62776), font=icon_font, fill=255)
+    text_cache.draw(image, (x + 65, top + 5), chr(62776), icon_font)
     # Icon disk
-    draw.text((x, top + 25), chr(63426), font=icon_font, fill=255)
+    text_cache.draw(image, (x, top + 25), chr(63426), icon_font)
     # Icon cpu
-    draw.text((x + 65, top + 25), chr(62171), font=icon_font, fill=255)
+    text_cache.draw(image, (x + 65, top + 25), chr(62171), icon_font)
     # Icon wifi
-    draw.text((x, top + 45), chr(61931), font=icon_font, fill=255)
+    text_cache.draw(image, (x, top + 45), chr(61931), icon_font)
 
     # Text
     # Text temperature
-    draw.text((x + 19, top + 5), str(Temperature, 'utf-8'), font=font, fill=255)
+    text_cache.draw(image, (x + 19, top + 5), Temperature, font)
     # Text memory usage
-    draw.text((x + 87, top + 5), str(MemUsage, 'utf-8'), font=font, fill=255)
+    text_cache.draw(image, (x + 87, top + 5), MemUsage, font)
     # Text Disk usage
-    draw.text((x + 19, top + 25), str(Disk, 'utf-8'), font=font, fill=255)
+    text_cache.draw(image, (x + 19, top + 25), Disk, font)
     # Text cpu usage
-    draw.text((x + 87, top + 25), str(CPU, 'utf-8'), font=font, fill=255)
+    text_cache.draw(image, (x + 87, top + 25), CPU, font)
     # Text IP address
-    draw.text((x + 19, top + 45), str(IP, 'utf-8'), font=font, fill=255)
+    text_cache.draw(image, (x + 19, top + 45), IP, font)
 
     # Display image
     oled.image(image)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# Page-aligned bitmap fonts for drawing text without PIL
+# stats.py and status.py used to draw text and icons with FreeType into a
+# PIL image that image() then packs into the SSD1306 buffer on every frame. A PageFont holds
+# every glyph already in the display's own format: one byte per column and
+# 8 pixel row page (MVLSB), glyph cells as wide as the glyph's advance. A
+# string is drawn at a page-aligned y by joining its glyphs' page rows and
+# ORing each row into the framebuffer with one slice assignment, so the
+# stats loops need neither PIL nor a pixel loop.
+#
+# The other icon screens (monitor.py, UPSMonitor.py and the dashboard pages)
+# stay on PIL with TextCache's cached glyphs: they put icons and text at
+# y = top + 5, +25 and +45, which are not page-aligned, and the dashboard
+# composes its pages in a PIL image.
+#
+# Fonts are rasterized with PIL once, PixelOperator.ttf and the
+# lineawesome-webfont.ttf icons of status.py by default, and saved in
+# $XDG_CACHE_HOME/oled-stats/fonts (~/.cache/oled-stats/fonts), named after
+# the SHA-256 of the TTF, the size and the characters. load_cached() reads
+# such a file, building it first if there is none. To build the default
+# fonts ahead of time, e.g. in a Docker image:
+#
+#   python3 page_font.py
+#
+# File layout: HEADER, then GLYPH records, then every glyph's page rows
+# (`pages * width` bytes each, page after page).
+import os
+import sys
+import struct
+import hashlib
+
+MAGIC = b"OLEDPFN1"
+HEADER = struct.Struct("<8sBH")  # magic, height in pages, glyph count
+GLYPH = struct.Struct("<IB")  # code point, width in columns
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                         "oled-stats", "fonts")
+ASCII = "".join(map(chr, range(32, 127)))
+TEXT = ASCII + "\u00b0"  # and the degree sign of status.py's "°C"
+
+# lineawesome-webfont.ttf glyphs status.py draws
+ICONS = "".join(map(chr, (61931, 62171, 62153, 62776, 63426, 62034)))
+
+
+class PageFont:
+    def __init__(self, pages, glyphs):
+        self.pages = pages  # glyph height in 8 pixel pages
+        self.glyphs = glyphs  # character -> tuple of page rows (bytes)
+        self.missing = glyphs.get("?") or next(iter(glyphs.values()))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, pages, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a page font: " + path)
+        offset = HEADER.size + count * GLYPH.size
+        glyphs = {}
+        for code, width in GLYPH.iter_unpack(data[HEADER.size:offset]):
+            glyphs[chr(code)] = tuple(data[offset + page * width:offset + (page + 1) * width]
+                                      for page in range(pages))
+            offset += pages * width
+        return cls(pages, glyphs)
+
+    def save(self, path):
+        records = [GLYPH.pack(ord(char), len(rows[0])) for char, rows in self.glyphs.items()]
+        data = [row for rows in self.glyphs.values() for row in rows]
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(b"".join([HEADER.pack(MAGIC, self.pages, len(self.glyphs)), *records, *data]))
+        os.replace(tmp, path)
+
+    def width(self, text):
+        glyphs = self.glyphs
+        return sum(len(glyphs.get(char, self.missing)[0]) for char in text)
+
+    # Page rows of a whole string
+    def render(self, text):
+        glyphs = [self.glyphs.get(char, self.missing) for char in text]
+        return [b"".join(glyph[page] for glyph in glyphs) for page in range(self.pages)]
+
+    # Draw text with its top left corner at (x, y) into an MVLSB framebuffer
+    # (adafruit_framebuf, unrotated); y must be a multiple of 8. Like
+    # ImageDraw.text() it only sets pixels, so overlapping strings keep each
+    # other's, and whatever lies outside the buffer is clipped. Returns the x
+    # after the text.
+    def draw(self, fb, x, y, text):
+        if y % 8 or fb.rotation or fb.stride != fb.width:
+            raise ValueError("page fonts need an unrotated framebuffer and a y divisible by 8")
+        rows = self.render(text)
+        first = max(0, -x)
+        end = min(len(rows[0]), fb.width - x)
+        if end <= first:
+            return x + max(end, 0)
+        count = end - first
+        buf = fb.buf
+        for page, row in enumerate(rows, y // 8):
+            if not 0 <= page < fb.height // 8:
+                continue
+            start = page * fb.stride + x + first
+            if count != len(row):
+                row = row[first:end]
+            under = int.from_bytes(buf[start:start + count], "little")
+            buf[start:start + count] = (under | int.from_bytes(row, "little")).to_bytes(count, "little")
+        return x + end
+
+
+# Rasterize `chars` of a TrueType font at `size` pixels. Every glyph is drawn
+# the way ImageDraw.text() draws it at the cell's top left corner, and has to
+# fit a cell of its advance width and `pages` pages (enough for the tallest
+# glyph by default).
+def rasterize(path, size, chars, pages=None):
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.truetype(path, size)
+    bottom = max(font.getbbox(char)[3] for char in chars)
+    pages = pages or (bottom + 7) // 8
+    glyphs = {}
+    for char in chars:
+        left, top, right, bottom = font.getbbox(char)
+        width = int(round(font.getlength(char)))
+        if left < 0 or top < 0 or right > width or bottom > pages * 8 or width > 255:
+            raise ValueError("glyph %r of %s doesn't fit a %d page cell" % (char, path, pages))
+        cell = Image.new("1", (width, pages * 8))
+        ImageDraw.Draw(cell).text((0, 0), char, font=font, fill=255)
+        # column by column, topmost pixel in bit 0: MVLSB bytes, pages within a column
+        data = cell.transpose(Image.Transpose.TRANSPOSE).tobytes("raw", "1;R")
+        glyphs[char] = tuple(data[page::pages] for page in range(pages))
+    return PageFont(pages, glyphs)
+
+
+def cache_path(path, size, chars, cache_dir=CACHE_DIR):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    digest.update(("%d:%s" % (size, chars)).encode())
+    return os.path.join(cache_dir, digest.hexdigest()[:32] + ".pfont")
+
+
+# The font from the cache, rasterized and stored there first if needed
+def load_cached(path, size, chars=TEXT, cache_dir=CACHE_DIR):
+    cached = cache_path(path, size, chars, cache_dir)
+    try:
+        return PageFont.load(cached)
+    except (OSError, ValueError, struct.error):
+        pass
+    font = rasterize(path, size, chars)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        font.save(cached)
+    except OSError:
+        pass  # read-only cache, rasterize again next time
+    return font
+
+
+def main(argv):
+    for path, size, chars in (("PixelOperator.ttf", 16, TEXT), ("lineawesome-webfont.ttf", 16, ICONS)):
+        font = load_cached(path, size, chars)
+        print("%s %dpx: %d glyphs, %d pages -> %s" % (path, size, len(font.glyphs), font.pages,
+                                                      cache_path(path, size, chars)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
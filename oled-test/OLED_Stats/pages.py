@@ -0,0 +1,300 @@
+# Pages for dashboard.py
+# A page registers the metrics it needs in setup() and draws one frame in
+# render(). The dashboard owns the display, the I2C bus, the fonts, the text
+# cache and the metrics cache, and hands itself to both methods, so adding a
+# screen means adding a Page subclass here and an entry in PAGES.
+import socket
+import threading
+import time
+
+from PIL import Image
+
+from collector import GB, busy_percent
+from history import History
+
+# Icons from lineawesome-webfont.ttf
+ICON_TEMP = chr(62609)
+ICON_MEMORY = chr(62776)
+ICON_DISK = chr(63426)
+ICON_CPU = chr(62171)
+ICON_WIFI = chr(61931)
+ICON_PLUG = chr(61926)
+ICON_WARNING = chr(0xf071)
+ICON_BATTERY_FULL = chr(62018)
+ICON_BATTERY_LOW = chr(62020)
+ICON_BOLT = chr(61671)
+
+padding = -2
+top = padding
+
+
+class Page:
+    name = None
+    duration = 5.0  # seconds on screen before the dashboard moves on
+    icons = ()      # glyphs to rasterize at startup
+    direct = False  # True: render() draws into dash.oled's framebuffer instead of dash.image
+
+    def setup(self, dash):
+        dash.text.preload(dash.icon_font, self.icons)
+
+    def render(self, dash):
+        raise NotImplementedError
+
+    # Called once the frame drawn by render() is on the display
+    def shown(self, dash):
+        pass
+
+
+# Icons and values, same layout as monitor.py
+class SystemPage(Page):
+    name = "system"
+    icons = (ICON_TEMP, ICON_MEMORY, ICON_DISK, ICON_CPU, ICON_WIFI)
+
+    def setup(self, dash):
+        super().setup(dash)
+        stats = dash.stats
+
+        def mem_usage():
+            used, total = stats.memory()
+            return "%.2f%%" % (used * 100 / total)
+
+        def disk_usage():
+            used, total, _ = stats.disk()
+            return "%d/%dGB" % ((used + GB - 1) // GB, (total + GB - 1) // GB)
+
+        dash.metric("ip", stats.ip)
+        dash.metric("load", lambda: "%.2fLA" % stats.loadavg()[0], interval=1.0)
+        dash.metric("mem", mem_usage)
+        dash.metric("disk", disk_usage)
+        dash.metric("temp", lambda: "%.1f" % stats.temperature())
+
+    def render(self, dash):
+        draw = dash.text.draw
+        image = dash.image
+        draw(image, (0, top + 5), ICON_TEMP, dash.icon_font)
+        draw(image, (65, top + 5), ICON_MEMORY, dash.icon_font)
+        draw(image, (0, top + 25), ICON_DISK, dash.icon_font)
+        draw(image, (65, top + 25), ICON_CPU, dash.icon_font)
+        draw(image, (0, top + 45), ICON_WIFI, dash.icon_font)
+
+        draw(image, (19, top + 5), dash.metrics.get("temp"), dash.font)
+        draw(image, (87, top + 5), dash.metrics.get("mem"), dash.font)
+        draw(image, (19, top + 25), dash.metrics.get("disk"), dash.font)
+        draw(image, (87, top + 25), dash.metrics.get("load"), dash.font)
+        draw(image, (19, top + 45), dash.metrics.get("ip"), dash.font)
+
+
+# Text only, same layout as stats.py
+class StatsPage(Page):
+    name = "stats"
+
+    def setup(self, dash):
+        super().setup(dash)
+        stats = dash.stats
+
+        def mem_text():
+            used, total = stats.memory()
+            return f"Mem: {used / GB:.1f}/{total / GB:.1f}GB {used * 100 / total:.1f}%"
+
+        def disk_text():
+            used, total, percent = stats.disk()
+            return "Disk: %d/%dGB %d%%" % ((used + GB - 1) // GB, (total + GB - 1) // GB, percent)
+
+        dash.metric("ip", stats.ip)
+        dash.metric("load", lambda: "%.2fLA" % stats.loadavg()[0], interval=1.0)
+        dash.metric("temp", lambda: "%.1f" % stats.temperature())
+        dash.metric("mem_text", mem_text, interval=1.0)
+        dash.metric("disk_text", disk_text, interval=30.0)
+
+    def render(self, dash):
+        draw = dash.text.draw
+        image = dash.image
+        draw(image, (0, 0), "IP: " + dash.metrics.get("ip"), dash.font)
+        draw(image, (0, 16), "CPU: " + dash.metrics.get("load"), dash.font)
+        draw(image, (80, 16), dash.metrics.get("temp"), dash.font)
+        draw(image, (0, 32), dash.metrics.get("mem_text"), dash.font)
+        draw(image, (0, 48), dash.metrics.get("disk_text"), dash.font)
+
+
+# Host name, address and throughput of all non-loopback interfaces
+class NetworkPage(Page):
+    name = "network"
+    icons = (ICON_WIFI,)
+
+    def setup(self, dash):
+        super().setup(dash)
+        self._last = None
+
+        def rates():
+            now = time.monotonic()
+            rx, tx = dash.stats.net_bytes()
+            last, self._last = self._last, (now, rx, tx)
+            if last is None or now <= last[0]:
+                return "", ""
+            elapsed = now - last[0]
+            return _rate((rx - last[1]) / elapsed), _rate((tx - last[2]) / elapsed)
+
+        dash.metric("ip", dash.stats.ip)
+        dash.metric("hostname", socket.gethostname, interval=60.0)
+        dash.metric("net", rates, interval=2.0, default=("", ""))
+
+    def render(self, dash):
+        draw = dash.text.draw
+        image = dash.image
+        rx, tx = dash.metrics.get("net")
+        draw(image, (0, 0), ICON_WIFI, dash.icon_font)
+        draw(image, (22, 0), dash.metrics.get("hostname"), dash.font, static=True)
+        draw(image, (0, 16), "IP: " + dash.metrics.get("ip"), dash.font)
+        draw(image, (0, 32), "RX: " + rx, dash.font)
+        draw(image, (0, 48), "TX: " + tx, dash.font)
+
+
+def _rate(bytes_per_second):
+    if bytes_per_second >= 1024 * 1024:
+        return "%.1f MB/s" % (bytes_per_second / 1024 / 1024)
+    return "%.1f KB/s" % (bytes_per_second / 1024)
+
+
+# CPU, temperature and memory history as graphs, one column per sample
+# The page draws straight into the display's framebuffer. When the previous
+# frame was this page too, a frame only scrolls the framebuffer left by the
+# number of new samples and draws those columns, O(height) per sample
+# instead of redrawing every graph. The current values sit on the left,
+# where the scroll leaves stale columns, and are pasted over them.
+class GraphPage(Page):
+    name = "graph"
+    direct = True
+    icons = (ICON_CPU, ICON_TEMP, ICON_MEMORY)
+    label_width = 40
+    interval = 2.0  # seconds per sample
+    # (icon, lowest, highest) per graph; the ranges are fixed so that a new
+    # sample never rescales the columns already drawn
+    graphs = ((ICON_CPU, 0.0, 100.0), (ICON_TEMP, 30.0, 85.0), (ICON_MEMORY, 0.0, 100.0))
+
+    def setup(self, dash):
+        super().setup(dash)
+        stats = dash.stats
+        oled = dash.oled
+        band = oled.height // len(self.graphs)
+        self.bands = [(i * band, band - 1) for i in range(len(self.graphs))]  # (top, height)
+        # one sample more than there are columns, for the line into the first one
+        self.history = [History(oled.width - self.label_width + 1) for _ in self.graphs]
+        self.labels = Image.new("1", (self.label_width, oled.height))
+        self._label_text = None
+        self._drawn = 0  # samples drawn so far
+        self._lock = threading.Lock()  # samples arrive on the metrics thread
+        self._cpu = stats.cpu_times()[0]
+        dash.text.preload(dash.font, "0123456789")
+
+        def sample():
+            times = stats.cpu_times()[0]
+            cpu = busy_percent(self._cpu, times)
+            self._cpu = times
+            try:
+                temp = stats.temperature()
+            except OSError:
+                temp = 0.0  # no thermal zone
+            used, total = stats.memory()
+            return self.add_sample((cpu, temp, used * 100 / total))
+
+        # a column per interval: not stretched while the screen is idle
+        dash.metric("history", sample, interval=self.interval, default=(0.0, 0.0, 0.0), scaled=False)
+
+    # One value per graph, the newest column
+    def add_sample(self, values):
+        with self._lock:
+            for history, value in zip(self.history, values):
+                history.append(value)
+        return values
+
+    def render(self, dash):
+        oled = dash.oled
+        span = oled.width - self.label_width
+        with self._lock:
+            count = self.history[0].count
+            new = count - self._drawn
+            if dash.rendered is not self or new >= span:
+                # the framebuffer holds another page: draw everything once
+                oled.fill(0)
+                samples = [history.last(span + 1) for history in self.history]
+                if len(samples[0]) <= span:
+                    samples = [values[:1] + values for values in samples]
+                x = oled.width - len(samples[0]) + 1
+            else:
+                if new:
+                    oled.scroll(-new, 0)
+                # plus the newest sample already drawn, to join the line to it
+                samples = [history.last(new + 1) for history in self.history]
+                x = oled.width - new
+            latest = [history[-1] for history in self.history]
+        self._drawn = count
+
+        for (_, low, high), (top, height), values in zip(self.graphs, self.bands, samples):
+            scale = (height - 1) / (high - low)
+            previous = None
+            for column, value in enumerate(values):
+                y = top + height - 1 - round((min(max(value, low), high) - low) * scale)
+                if previous is not None:
+                    oled.fill_rect(x + column - 1, top, 1, height, 0)
+                    oled.vline(x + column - 1, min(y, previous), abs(y - previous) + 1, 1)
+                previous = y
+
+        text = tuple("%d" % round(value) for value in latest)
+        if text != self._label_text:
+            self._label_text = text
+            labels = self.labels
+            labels.paste(0, (0, 0) + labels.size)
+            for (icon, _, _), (top, height), value in zip(self.graphs, self.bands, text):
+                dash.text.draw(labels, (0, top + 1), icon, dash.icon_font)
+                dash.text.draw(labels, (self.label_width - 2, top + 1), value, dash.font, anchor="ra")
+        oled.blit_image(self.labels)
+
+
+# SupTronics X1200 UPS, same screen as UPSMonitor.py
+# A power loss or return switches the dashboard to this page immediately.
+class UpsPage(Page):
+    name = "ups"
+    icons = (ICON_PLUG, ICON_WARNING, ICON_BATTERY_FULL, ICON_BATTERY_LOW, ICON_BOLT)
+    address = 0x36
+    power_pin = 6
+
+    def setup(self, dash):
+        super().setup(dash)
+        # Only needed when the UPS page is enabled
+        from ups import UpsSampler, PowerMonitor
+        bus = None
+        if dash.broker is not None:
+            from i2c_broker import BrokerI2C, PRIORITY_URGENT
+            bus = BrokerI2C(dash.broker, "ups", PRIORITY_URGENT)
+        self.sampler = UpsSampler(bus=bus, address=self.address)
+        self.sampler.sample()
+        self.sampler.start()
+
+        def power_changed(ac_power):
+            dash.show_page(self.name)
+            dash.wake.set()
+
+        self.power = PowerMonitor(self.power_pin, sampler=self.sampler, on_change=power_changed,
+                                  shutdown_after=dash.shutdown_after)
+        dash.text.preload(dash.font, ("Plugged In", "Power Loss"))
+
+    def render(self, dash):
+        voltage, capacity = self.sampler.read()
+        if voltage is None:  # gauge not read successfully yet
+            voltage = capacity = 0.0
+        ac_power = self.power.ac_power
+
+        draw = dash.text.draw
+        image = dash.image
+        draw(image, (10, top + 5), ICON_PLUG if ac_power else ICON_WARNING, dash.icon_font)
+        draw(image, (35, top + 5), "Plugged In" if ac_power else "Power Loss", dash.font, static=True)
+        draw(image, (20, top + 25), ICON_BATTERY_FULL if capacity > 50 else ICON_BATTERY_LOW, dash.icon_font)
+        draw(image, (45, top + 25), f"{capacity:.1f}%", dash.font)
+        draw(image, (20, top + 45), ICON_BOLT, dash.icon_font)
+        draw(image, (45, top + 45), f"{voltage:.2f}V", dash.font)
+
+    def shown(self, dash):
+        self.power.frame_shown()
+
+
+PAGES = {page.name: page for page in (SystemPage, StatsPage, NetworkPage, GraphPage, UpsPage)}
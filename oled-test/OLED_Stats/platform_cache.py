@@ -0,0 +1,110 @@
+# Cached Blinka platform detection
+# `import board` (and busio, digitalio, ...) goes through adafruit_blinka's
+# agnostic module, which runs adafruit_platformdetect on every start: it
+# reads /proc/cpuinfo, the device tree and more to work out the chip and the
+# board, a noticeable part of the startup time on a Pi Zero. Blinka skips all
+# of that when BLINKA_FORCECHIP and BLINKA_FORCEBOARD are set, so load()
+# detects the platform once, stores both in an env-style file and sets them
+# from that file on later starts.
+#
+# The file also holds a fingerprint of the kernel (uname), the device tree
+# model/compatible strings and the installed adafruit_platformdetect, and is
+# ignored and rewritten when any of them changes. Variables already set in
+# the environment always win. The cache lives in
+# $XDG_CACHE_HOME/oled-stats/platform.env (~/.cache/oled-stats).
+#
+# load() has to run before anything imports board, busio or digitalio
+# (adafruit_ssd1306 imports busio itself):
+#
+#   import platform_cache
+#   platform_cache.load()
+#   import board
+import os
+import sys
+import zlib
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "oled-stats")
+CACHE_FILE = os.path.join(CACHE_DIR, "platform.env")
+VARIABLES = ("BLINKA_FORCECHIP", "BLINKA_FORCEBOARD")
+DEVICE_TREE_FILES = ("/proc/device-tree/model", "/proc/device-tree/compatible")
+# Located by path so that fingerprint() doesn't have to import it
+DETECTOR_PACKAGE = os.path.join("adafruit_platformdetect", "__init__.py")
+
+
+# Changes whenever platform detection could come to a different result
+def fingerprint():
+    parts = [" ".join(os.uname()).encode()]
+    for path in DEVICE_TREE_FILES:
+        try:
+            with open(path, "rb") as f:
+                parts.append(f.read())
+        except OSError:
+            parts.append(b"-")
+    # the installed adafruit_platformdetect, found without importing it
+    for directory in sys.path:
+        try:
+            parts.append(str(os.stat(os.path.join(directory or ".", DETECTOR_PACKAGE)).st_mtime_ns).encode())
+            break
+        except OSError:
+            pass
+    data = b"\0".join(parts)
+    return "%08x%08x" % (zlib.crc32(data), zlib.adler32(data))
+
+
+# KEY=VALUE lines of an env file, {} if there is none
+def read_env(path):
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep and not key.startswith("#"):
+                    values[key] = value
+    except OSError:
+        pass
+    return values
+
+
+def write_env(path, values):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "w") as f:
+        f.write("# Blinka platform detected by platform_cache.py, delete to detect again\n")
+        for key, value in values.items():
+            f.write("%s=%s\n" % (key, value))
+    os.replace(tmp, path)
+
+
+# Run the full adafruit_platformdetect probe; {} for an unknown chip
+def detect():
+    from adafruit_platformdetect import Detector
+
+    detector = Detector()
+    values = {}
+    if detector.chip.id:
+        values["BLINKA_FORCECHIP"] = detector.chip.id
+        if detector.board.id:
+            values["BLINKA_FORCEBOARD"] = detector.board.id
+    return values
+
+
+# Set the BLINKA_FORCE* variables from the cache, detecting and caching the
+# platform first if the cache is missing or stale. Returns True on a cache hit.
+def load(path=CACHE_FILE):
+    if all(name in os.environ for name in VARIABLES):
+        return True
+    current = fingerprint()
+    values = read_env(path)
+    hit = values.pop("FINGERPRINT", None) == current and "BLINKA_FORCECHIP" in values
+    if not hit:
+        values = detect()
+        if values:
+            try:
+                write_env(path, dict(FINGERPRINT=current, **values))
+            except OSError:
+                pass  # read-only home, e.g. in a container: detect again next time
+    for name, value in values.items():
+        if name in VARIABLES:
+            os.environ.setdefault(name, value)
+    return hit
+
@@ -8,9 +8,11 @@ import psutil as PS
 import socket
 import board
 import digitalio
-import adafruit_ssd1306
+import ssd1306_fast  # adafruit_ssd1306 with skip-unchanged and dirty-window show()
+from metrics_cache import MetricsCache
 #
 from PIL import Image, ImageDraw, ImageFont
+from text_cache import TextCache
 #
 KB=1024
 MB=KB*1024
@@ -54,7 +56,7 @@ def get_ipv4():
 #
 # Use for I2C.
 i2c = board.I2C()
-oled = adafruit_ssd1306.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
+oled = ssd1306_fast.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
 
 # Clear display.
 oled.fill(0)
@@ -78,29 +80,50 @@ x = 0
 # font = ImageFont.load_default()
 font = ImageFont.truetype('PixelOperator.ttf', FONTSIZE)
 
-while True:
-    # Draw a black filled box to clear the image.
-    draw.rectangle((0,0,oled.width,oled.height), outline=0, fill=0)
-
-    IP = get_ipv4()
-    # IP = get_ipv4_from_interface("eth0") # Alternative
-    
-    CPU = "CPU {:.1f}%".format(round(PS.cpu_percent(),1))
+# Glyphs are rasterized once and pasted from the cache on every frame
+text_cache = TextCache()
+text_cache.preload(font, "0123456789.%/: ")
+#
+def get_cpu():
+    return "CPU {:.1f}%".format(round(PS.cpu_percent(),1))
 
+def get_temp():
     temps=PS.sensors_temperatures()
-    TEMP= "{:.1f}°C".format(round(temps['cpu_thermal'][0].current,1))
+    return "{:.1f}°C".format(round(temps['cpu_thermal'][0].current,1))
 
+def get_mem():
     mem=PS.virtual_memory()
-    MemUsage = "Mem {:5d}/{:5d}MB".format(round((mem.used+MB-1)/MB),round((mem.total+MB-1)/MB))
+    return "Mem {:5d}/{:5d}MB".format(round((mem.used+MB-1)/MB),round((mem.total+MB-1)/MB))
 
+def get_disk():
     root=PS.disk_usage("/")
-    Disk="Disk {:4d}/{:4d}GB".format(round((root.used+GB-1)/GB),round((root.total+GB-1)/GB))
+    return "Disk {:4d}/{:4d}GB".format(round((root.used+GB-1)/GB),round((root.total+GB-1)/GB))
+
+cache = MetricsCache()
+cache.add("ip", get_ipv4)
+# cache.add("ip", lambda: get_ipv4_from_interface("eth0")) # Alternative
+cache.add("cpu", get_cpu)
+cache.add("temp", get_temp)
+cache.add("mem", get_mem)
+cache.add("disk", get_disk)
+cache.start()
+
+while True:
+    # Draw a black filled box to clear the image.
+    draw.rectangle((0,0,oled.width,oled.height), outline=0, fill=0)
+
+    # Latest values from the metrics cache
+    IP = cache.get("ip")
+    CPU = cache.get("cpu")
+    TEMP = cache.get("temp")
+    MemUsage = cache.get("mem")
+    Disk = cache.get("disk")
 
-    draw.text((x, top),             IP,       font=font, fill=255)
-    draw.text((x, top+FONTSIZE),    CPU,      font=font, fill=255)
-    draw.text((x+80,top+FONTSIZE),  TEMP,     font=font, fill=255)
-    draw.text((x, top+2*FONTSIZE),  MemUsage, font=font, fill=255)
-    draw.text((x, top+3*FONTSIZE),  Disk,     font=font, fill=255)
+    text_cache.draw(image, (x, top),             IP,       font)
+    text_cache.draw(image, (x, top+FONTSIZE),    CPU,      font)
+    text_cache.draw(image, (x+80,top+FONTSIZE),  TEMP,     font)
+    text_cache.draw(image, (x, top+2*FONTSIZE),  MemUsage, font)
+    text_cache.draw(image, (x, top+3*FONTSIZE),  Disk,     font)
 
     # Display image
     oled.image(image)
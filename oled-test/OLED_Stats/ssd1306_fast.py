@@ -0,0 +1,114 @@
+# Drop-in replacement for adafruit_ssd1306.SSD1306_I2C that sends less over I2C
+# show() keeps a shadow copy of the last transmitted framebuffer. Unchanged
+# frames are not sent at all; otherwise the column/page address window is set
+# to the smallest rectangle around the changed bytes and only that is sent.
+# bytes_sent / bytes_saved / frames_sent / frames_skipped count the bus load.
+# image() packs PIL images in bulk, see framebuf_fast.
+import adafruit_ssd1306
+from adafruit_ssd1306 import SET_COL_ADDR, SET_PAGE_ADDR
+
+from framebuf_fast import FastFrameBufferMixin
+
+
+class SSD1306_I2C(FastFrameBufferMixin, adafruit_ssd1306.SSD1306_I2C):
+    def __init__(self, width, height, i2c, *, partial=True, **kwargs):
+        # The base constructor already calls show(), so set up state first
+        self.partial = partial
+        self._shadow = None
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        # 6 address commands sent as 2-byte writes plus the whole buffer
+        self._full_cost = 6 * 2 + (height // 8) * width + 1
+        self._cmd = bytearray(7)
+        self._cmd[0] = 0x00  # Co=0, D/C#=0: all following bytes are commands
+        super().__init__(width, height, i2c, **kwargs)
+
+    def write_cmd(self, cmd):
+        self.bytes_sent += 2
+        super().write_cmd(cmd)
+
+    # Force the next show() to send the whole frame, e.g. after the display
+    # was reset or its RAM was written by something else
+    def invalidate(self):
+        self._shadow = None
+
+    def show(self):
+        if not self.partial or self.page_addressing or self._shadow is None:
+            self.bytes_sent += len(self.buffer)
+            super().show()
+            self.frames_sent += 1
+            self._shadow = bytearray(self.buffer[1:])
+            return
+
+        window = self._dirty_window()
+        if window is None:
+            self.frames_skipped += 1
+            self.bytes_saved += self._full_cost
+            return
+        page0, page1, col0, col1 = window
+
+        offset = (128 - self.width) // 2 if self.width != 128 else 0
+        cmd = self._cmd
+        cmd[1] = SET_COL_ADDR
+        cmd[2] = col0 + offset
+        cmd[3] = col1 + offset
+        cmd[4] = SET_PAGE_ADDR
+        cmd[5] = page0
+        cmd[6] = page1
+
+        data = bytearray(1 + (page1 - page0 + 1) * (col1 - col0 + 1))
+        data[0] = 0x40  # Co=0, D/C#=1
+        pos = 1
+        for page in range(page0, page1 + 1):
+            start = 1 + page * self.width
+            row = self.buffer[start + col0:start + col1 + 1]
+            data[pos:pos + len(row)] = row
+            self._shadow[start - 1 + col0:start + col1] = row
+            pos += len(row)
+
+        with self.i2c_device:
+            self.i2c_device.write(cmd)
+        with self.i2c_device:
+            self.i2c_device.write(data)
+        sent = len(cmd) + len(data)
+        self.bytes_sent += sent
+        self.bytes_saved += self._full_cost - sent
+        self.frames_sent += 1
+
+    # Smallest (first page, last page, first column, last column) window that
+    # covers every byte differing from the shadow copy, None if nothing changed
+    def _dirty_window(self):
+        width = self.width
+        page0 = page1 = None
+        col0 = width
+        col1 = -1
+        for page in range(self.pages):
+            start = page * width
+            new = self.buffer[1 + start:1 + start + width]
+            old = self._shadow[start:start + width]
+            if new == old:
+                continue
+            # XOR the page as one big integer to find the first and last
+            # differing byte without a per-column Python loop
+            diff = int.from_bytes(new, "big") ^ int.from_bytes(old, "big")
+            first = width - 1 - (diff.bit_length() - 1) // 8
+            last = width - 1 - ((diff & -diff).bit_length() - 1) // 8
+            col0 = min(col0, first)
+            col1 = max(col1, last)
+            if page0 is None:
+                page0 = page
+            page1 = page
+        if page0 is None:
+            return None
+        return page0, page1, col0, col1
+
+    # Bus load counters, e.g. for logging
+    def bus_stats(self):
+        return {
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_saved,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+        }
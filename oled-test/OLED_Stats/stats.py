@@ -3,14 +3,17 @@
 # Base on Adafruit Blinka & SSD1306 Libraries
 # Installation & Setup Instructions - https://www.the-diy-life.com/add-an-oled-stats-display-to-raspberry-pi-os-bullseye/
 import time
+import platform_cache  # Blinka platform from the cache, before anything imports board or busio
+platform_cache.load()
 import board
 import busio
 import gpiozero
 
-from PIL import Image, ImageDraw, ImageFont
-import adafruit_ssd1306
+import page_font  # text straight into the framebuffer, no PIL at runtime
+import ssd1306_fast  # adafruit_ssd1306 with skip-unchanged and dirty-window show()
 
-import subprocess
+from collector import Collector, GB
+from metrics_cache import MetricsCache
 
 # Use gpiozero to control the reset pin
 oled_reset_pin = gpiozero.OutputDevice(4, active_high=False)  # GPIO 4 for reset, active low
@@ -34,53 +37,53 @@ time.sleep(0.1)  # Wait for reset
 oled_reset_pin.on()  # Turn reset pin back high
 
 # Create the OLED display object
-oled = adafruit_ssd1306.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
+oled = ssd1306_fast.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C)
 
 # Clear the display
 oled.fill(0)
 oled.show()
 
-# Create a blank image for drawing
-image = Image.new("1", (oled.width, oled.height))
+# PixelOperator 16px, rasterized once into page-aligned glyphs and cached
+font = page_font.load_cached('PixelOperator.ttf', 16)
 
-# Get drawing object to draw on image
-draw = ImageDraw.Draw(image)
+# Open /proc and /sys once, re-read them every loop
+stats = Collector()
 
-# Draw a white background
-draw.rectangle((0, 0, oled.width, oled.height), outline=255, fill=255)
+def mem_usage():
+    used, total = stats.memory()
+    return f"Mem: {used / GB:.1f}/{total / GB:.1f}GB {used * 100 / total:.1f}%"
 
-font = ImageFont.truetype('PixelOperator.ttf', 16)
+def disk_usage():
+    used, total, percent = stats.disk()
+    return "Disk: %d/%dGB %d%%" % ((used + GB - 1) // GB, (total + GB - 1) // GB, percent)
+
+cache = MetricsCache()
+cache.add("ip", stats.ip)
+cache.add("cpu", lambda: "CPU: %.2f" % stats.loadavg()[0])
+cache.add("mem", mem_usage)
+cache.add("disk", disk_usage)
+cache.add("temp", lambda: "%.1f" % stats.temperature())
+cache.start()
 
 while True:
-    # Draw a black filled box to clear the image
-    draw.rectangle((0, 0, oled.width, oled.height), outline=0, fill=0)
-
-    # Shell scripts for system monitoring from here : https://unix.stackexchange.com/questions/119126/command-to-display-memory-usage-disk-usage-and-cpu-load
-    cmd = "hostname -I | cut -d\' \' -f1"
-    IP = subprocess.check_output(cmd, shell=True)
-    cmd = "top -bn1 | grep load | awk '{printf \"CPU: %.2f\", $(NF-2)}'"
-    CPU = subprocess.check_output(cmd, shell=True)
-    cmd = "free -m | awk 'NR==2{printf \"%.1f %.1f %.1f\", $3/1024,$2/1024,($3/$2)*100}'"
-    MemUsage = subprocess.check_output(cmd, shell=True)
-    mem_parts = MemUsage.decode('utf-8').strip().split()
-    mem_used_gb = mem_parts[0]
-    mem_total_gb = mem_parts[1]
-    mem_percent = mem_parts[2]
-    mem_display = f"Mem: {mem_used_gb}/{mem_total_gb}GB {mem_percent}%"
-    cmd = "df -h | awk '$NF==\"/\"{printf \"Disk: %d/%dGB %s\", $3,$2,$5}'"
-    Disk = subprocess.check_output(cmd, shell=True)
-    cmd = "cat /sys/class/thermal/thermal_zone*/temp | awk -v CONVFMT='%.1f' '{printf $1/1000}'"
-    Temp = subprocess.check_output(cmd, shell=True)
+    # Clear the framebuffer
+    oled.fill(0)
+
+    # System monitoring, latest values from the metrics cache
+    IP = cache.get("ip")
+    CPU = cache.get("cpu")
+    mem_display = cache.get("mem")
+    Disk = cache.get("disk")
+    Temp = cache.get("temp")
 
     # Pi Stats Display
-    draw.text((0, 0), "IP: " + str(IP, 'utf-8'), font=font, fill=255)
-    draw.text((0, 16), str(CPU, 'utf-8') + "LA", font=font, fill=255)
-    draw.text((80, 16), str(Temp, 'utf-8'), font=font, fill=255)
-    draw.text((0, 32), mem_display, font=font, fill=255)
-    draw.text((0, 48), str(Disk, 'utf-8'), font=font, fill=255)
-
-    # Display the image
-    oled.image(image)
+    font.draw(oled, 0, 0, "IP: " + IP)
+    font.draw(oled, 0, 16, CPU + "LA")
+    font.draw(oled, 80, 16, Temp)
+    font.draw(oled, 0, 32, mem_display)
+    font.draw(oled, 0, 48, Disk)
+
+    # Display the framebuffer
     oled.show()
 
     # Wait for the next loop
@@ -3,13 +3,18 @@
 # For Raspberry Pi Desktop Case with OLED Stats Display
 # Base on Adafruit CircuitPython & SSD1306 Libraries
 # Installation & Setup Instructions - https://www.the-diy-life.com/add-an-oled-stats-display-to-raspberry-pi-os-bullseye/
+import time
+import platform_cache  # Blinka platform from the cache, before anything imports board or busio
+platform_cache.load()
 import board
 import busio
 import digitalio
-import adafruit_ssd1306
-import subprocess
+import ssd1306_fast  # adafruit_ssd1306 with skip-unchanged and dirty-window show()
 
-from PIL import Image, ImageDraw, ImageFont
+from collector import Collector, CpuSampler, KB, MB
+from metrics_cache import MetricsCache
+
+import page_font  # text and icons straight into the framebuffer, no PIL at runtime
 
 import sys
 import atexit
@@ -24,6 +29,16 @@ def kill_handler(*args):
     oled.show()
     sys.exit(0)
 
+# Same wording as `uptime`: "3 days", "1 day", "4:07" or "12 min"
+def format_uptime(seconds):
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 1440)
+    if days:
+        return "%d day%s" % (days, "" if days == 1 else "s")
+    if minutes >= 60:
+        return "%d:%02d" % divmod(minutes, 60)
+    return "%d min" % minutes
+
 atexit.register(exit_handler)
 signal.signal(signal.SIGINT, kill_handler)
 signal.signal(signal.SIGTERM, kill_handler)
@@ -32,65 +47,81 @@ signal.signal(signal.SIGTERM, kill_handler)
 width = 128
 height = 64
 
+# Display Refresh
+LOOPTIME = 1.0
+
+# CPU usage is averaged over this many seconds, sampled in the background
+CPU_WINDOW = 4.0
+
 # Font size
 font_sz = 16
 
 # Methode to control the display with oled func
-oled = adafruit_ssd1306.SSD1306_I2C(width, height, board.I2C(), addr=0x3C, reset=digitalio.DigitalInOut(board.D4))
+oled = ssd1306_fast.SSD1306_I2C(width, height, board.I2C(), addr=0x3C, reset=digitalio.DigitalInOut(board.D4))
 
 # Clear display.
 oled.fill(0)
 oled.show()
 
-# Create a blank image for drawing in 1-bit color
-image = Image.new('1', (oled.width, oled.height))
+# Import custom fonts, rasterized once into the display's page format (see page_font.py)
+font = page_font.load_cached('PixelOperator.ttf', font_sz)
+icon_font = page_font.load_cached('lineawesome-webfont.ttf', font_sz, page_font.ICONS)
+
+# Draw text with its right edge at x, like PIL's anchor="ra"
+def draw_right(x, y, text):
+    font.draw(oled, x - font.width(text), y, text)
 
-# Get drawing object to draw on image
-draw = ImageDraw.Draw(image)
+# Reads /proc and /sys directly, keeps the files open between loops
+stats = Collector()
 
-# Import custom fonts
-font = ImageFont.truetype('PixelOperator.ttf', font_sz)
-icon_font= ImageFont.truetype('lineawesome-webfont.ttf', font_sz)
+# Keeps rolling /proc/stat deltas in a background thread instead of `vmstat 4 2`
+cpu = CpuSampler(interval=0.5, window=CPU_WINDOW)
+cpu.start()
+
+def mem_usage():
+    used, total = stats.memory()
+    return "%.2f" % (used / MB / 1000), "%.0f" % (total / KB / 1000000), "%.1f" % (used * 100 / total)
+
+cache = MetricsCache()
+cache.add("ip", stats.ip) # First address that is not on the loopback interface
+cache.add("cpu", lambda: "%d" % round(cpu.percent())) # Usage over the last CPU_WINDOW seconds
+cache.add("mem", mem_usage, default=("", "", ""))
+cache.add("disk", lambda: "%d%%" % stats.disk()[2])
+cache.add("uptime", lambda: format_uptime(stats.uptime()))
+cache.add("temp", lambda: "%.1f" % stats.temperature())
+cache.start()
 
 while True:
-    draw.rectangle((0, 0, oled.width, oled.height), fill=0) # Draw a black filled box to clear the image.
-    cmd = "ip addr | awk '/inet / { print $2 }' | sed -n '2{p;q}' | cut -d '/' -f1" # Command that's executed in bash
-    IP = subprocess.check_output(cmd, shell = True ) # Register ouput from cmd in var
-    cmd = "vmstat 4 2|tail -1|awk '{print 100-$15}' | tr -d '\n'" # Takes a second to fetch for accurate cpu usage in %
-    CPU = subprocess.check_output(cmd, shell = True )
-    cmd = "free -m | awk 'NR==2{printf $3}'| awk '{printf $1/1000}'"
-    Memuse = subprocess.check_output(cmd, shell = True )
-    cmd = "cat /proc/meminfo | head -n 1 | awk -v CONVFMT='%.0f' '{printf $2/1000000}'"
-    MemTotal = subprocess.check_output(cmd, shell = True )
-    cmd = "free -m | awk -v CONVFMT='%.1f' 'NR==2{printf $3*100/$2}'"
-    Memuseper = subprocess.check_output(cmd, shell = True )
-    cmd = "df -h | awk '$NF==\"/\"{printf \"%s\", $5}'"
-    Disk = subprocess.check_output(cmd, shell = True )
-    cmd = "uptime | awk '{print $3,$4}' | cut -f1 -d','"
-    uptime = subprocess.check_output(cmd, shell = True )
-    cmd = "cat /sys/class/thermal/thermal_zone*/temp | awk -v CONVFMT='%.1f' '{printf $1/1000}'"
-    temp = subprocess.check_output(cmd, shell = True )
+    oled.fill(0) # Clear the framebuffer
+    IP = cache.get("ip")
+    CPU = cache.get("cpu")
+    Memuse, MemTotal, Memuseper = cache.get("mem")
+    Disk = cache.get("disk")
+    uptime = cache.get("uptime")
+    temp = cache.get("temp")
     # We draw the icons seprately and offset by a fixed amount later
     # Icon wifi, chr num comes from unicode &#xf1eb; to decimal 61931 (Use: https://www.binaryhexconverter.com/hex-to-decimal-converter)
-    draw.text((1, 0), chr(61931), font=icon_font, fill=255) # Offset the icon on the x-as a little and devide the y-as in steps of 16
+    icon_font.draw(oled, 1, 0, chr(61931)) # Offset the icon on the x-as a little and devide the y-as in steps of 16
     # Icon cpu
-    draw.text((1, 16), chr(62171), font=icon_font, fill=255)
+    icon_font.draw(oled, 1, 16, chr(62171))
     # Icon temp right
-    draw.text((111, 16), chr(62153), font=icon_font, fill=255) # Offset the icon from the left to the farthest right
+    icon_font.draw(oled, 111, 16, chr(62153)) # Offset the icon from the left to the farthest right
     # Icon memory
-    draw.text((1, 32), chr(62776), font=icon_font, fill=255)
+    icon_font.draw(oled, 1, 32, chr(62776))
     # Icon disk
-    draw.text((1, 48), chr(63426), font=icon_font, fill=255)
+    icon_font.draw(oled, 1, 48, chr(63426))
     # Icon time right
-    draw.text((111, 48), chr(62034), font=icon_font, fill=255)
+    icon_font.draw(oled, 111, 48, chr(62034))
     # Pi Stats Display, printed from left to right each line
-    draw.text((22, 0), str(IP,'utf-8'), font=font, fill=255) # x y followed by the content to be printed on the display followed by how it should be printed
-    draw.text((22, 16), str(CPU,'utf-8') + "%", font=font, fill=255)
-    draw.text((107, 16), str(temp,'utf-8') + "°C", font=font, fill=255, anchor="ra") # anchor basically refers to printing right to left: https://pillow.readthedocs.io/en/stable/handbook/text-anchors.html#specifying-an-anchor
-    draw.text((22, 32), str(Memuseper,'utf-8') + "%", font=font, fill=255)
-    draw.text((125, 32), str(Memuse,'utf-8') + "/" + str(MemTotal,'utf-8') + "G", font=font, fill=255, anchor="ra")
-    draw.text((22, 48), str(Disk,'utf-8'), font=font, fill=255)
-    draw.text((107, 48), str(uptime,'utf-8'), font=font, fill=255, anchor="ra")
-    # Display image
-    oled.image(image)
-    oled.show()
\ No newline at end of file
+    font.draw(oled, 22, 0, IP) # x y followed by the content to be printed on the display
+    font.draw(oled, 22, 16, CPU + "%")
+    draw_right(107, 16, temp + "°C") # printed right to left, ending at x
+    font.draw(oled, 22, 32, Memuseper + "%")
+    draw_right(125, 32, Memuse + "/" + MemTotal + "G")
+    font.draw(oled, 22, 48, Disk)
+    draw_right(107, 48, uptime)
+    # Display the framebuffer
+    oled.show()
+
+    # Wait for the next loop
+    time.sleep(LOOPTIME)
@@ -0,0 +1,74 @@
+# Cache of rasterized text for the OLED stats screens
+# ImageDraw.text() runs FreeType for every string on every frame, although the
+# icons never change and the values only ever use a few dozen characters.
+# TextCache keeps 1-bit bitmaps keyed by (font file, size, string) in an LRU
+# with a memory cap. Single characters (icons, and the glyphs dynamic strings
+# are composed from) and strings drawn with static=True are rasterized once;
+# after that drawing a string is just pasting cached bitmaps into the frame.
+# bench_text.py checks the result against ImageDraw.text().
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw
+
+
+class TextCache:
+    def __init__(self, max_bytes=64 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0  # bytes of bitmap data currently held
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()  # key -> (bitmap, x offset, y offset, advance)
+
+    def _key(self, font, text):
+        return getattr(font, "path", id(font)), getattr(font, "size", None), text
+
+    # Bitmap of `text` with its offset from the anchor point and its advance width
+    def _get(self, font, text):
+        key = self._key(font, text)
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        left, top, right, bottom = font.getbbox(text)
+        bitmap = Image.new("1", (max(right - left, 1), max(bottom - top, 1)))
+        ImageDraw.Draw(bitmap).text((-left, -top), text, font=font, fill=255)
+        entry = (bitmap, left, top, font.getlength(text))
+
+        self._cache[key] = entry
+        self.size += _cost(bitmap)
+        while self.size > self.max_bytes and len(self._cache) > 1:
+            _, (old, _, _, _) = self._cache.popitem(last=False)
+            self.size -= _cost(old)
+        return entry
+
+    # Rasterize icons and fixed labels up front, e.g. at startup
+    def preload(self, font, strings):
+        for text in strings:
+            self._get(font, text)
+
+    # Same as ImageDraw.text(xy, text, font=font, fill=fill, anchor=anchor) at
+    # integer coordinates for left/middle/right + ascender anchors ("la", "ma",
+    # "ra"). Strings drawn with static=True are cached whole, others are
+    # composed from cached glyphs.
+    def draw(self, image, xy, text, font, fill=255, anchor="la", static=False):
+        x, y = xy
+        if static or len(text) == 1:
+            glyphs = [self._get(font, text)]
+        else:
+            glyphs = [self._get(font, ch) for ch in text]
+        if anchor[0] != "l":
+            # PIL rounds the anchor offset of the whole line, not the glyph
+            # positions after it, so take the offset from its layout
+            x += font.getbbox(text, anchor=anchor)[0] - font.getbbox(text)[0]
+        pen = x
+        for bitmap, left, top, advance in glyphs:
+            image.paste(fill, (int(round(pen)) + left, y + top), bitmap)
+            pen += advance
+
+
+def _cost(bitmap):
+    return (bitmap.width + 7) // 8 * bitmap.height
+
@@ -0,0 +1,174 @@
+# SupTronics X1200 UPS: fuel gauge sampler and power-loss detection
+# The gauge at 0x36 keeps the cell voltage in registers 2-3 and the state of
+# charge in registers 4-5, both big endian. UpsSampler reads all four bytes
+# in one combined write/read transaction (i2c_rdwr, or writeto_then_readfrom
+# on a busio style bus such as i2c_broker.BrokerI2C) on its own thread,
+# smooths them with an exponential moving average and keeps the result, so
+# the display loop reads voltage and capacity without touching the bus.
+import struct
+import subprocess
+import threading
+import time
+
+import gpiozero
+
+try:
+    from smbus2 import SMBus, i2c_msg
+except ImportError:
+    from smbus import SMBus
+    i2c_msg = None
+
+ADDRESS = 0x36
+REG_VCELL = 0x02
+VCELL_SOC = struct.Struct(">HH")  # registers 2-5
+
+
+def decode(block):
+    vcell, soc = VCELL_SOC.unpack(block)
+    return vcell * 1.25 / 1000 / 16, soc / 256
+
+
+class UpsSampler(threading.Thread):
+    # smoothing is the weight of a new sample, 1.0 turns smoothing off
+    def __init__(self, bus=None, address=ADDRESS, interval=2.0, smoothing=0.3):
+        super().__init__(name="UpsSampler", daemon=True)
+        self.bus = bus if bus is not None else SMBus(1)
+        self.address = address
+        self.interval = interval
+        self.smoothing = smoothing
+        self.value = (None, None)  # smoothed (voltage, capacity), replaced as a whole
+        self.raw = None  # last unsmoothed (voltage, capacity)
+        self.updated = None  # monotonic time of the last good sample
+        self.samples = 0
+        self.errors = 0
+        self._rdwr = getattr(self.bus, "i2c_rdwr", None) if i2c_msg is not None else None
+        self._busio = hasattr(self.bus, "writeto_then_readfrom")
+        self._halt = threading.Event()
+        self._wake = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            self.sample()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stop(self):
+        self._halt.set()
+        self._wake.set()
+
+    # Change the sampling interval, taking effect right away
+    def set_interval(self, interval):
+        self.interval = interval
+        self._wake.set()
+
+    def read_block(self):
+        if self._rdwr is not None:
+            write = i2c_msg.write(self.address, [REG_VCELL])
+            read = i2c_msg.read(self.address, VCELL_SOC.size)
+            self._rdwr(write, read)
+            return bytes(read)
+        if self._busio:
+            block = bytearray(VCELL_SOC.size)
+            self.bus.writeto_then_readfrom(self.address, bytes((REG_VCELL,)), block)
+            return bytes(block)
+        return bytes(self.bus.read_i2c_block_data(self.address, REG_VCELL, VCELL_SOC.size))
+
+    # Take one sample and update the smoothed values, also usable without the thread
+    def sample(self):
+        try:
+            voltage, capacity = self.raw = decode(self.read_block())
+        except OSError:
+            self.errors += 1  # keep the last values, the gauge is read again next interval
+            return
+        old_voltage, old_capacity = self.value
+        if old_voltage is not None:
+            alpha = self.smoothing
+            voltage = old_voltage + alpha * (voltage - old_voltage)
+            capacity = old_capacity + alpha * (capacity - old_capacity)
+        self.value = (voltage, capacity)
+        self.samples += 1
+        self.updated = time.monotonic()
+
+    # Latest smoothed (voltage, capacity), (None, None) before the first sample
+    def read(self):
+        return self.value
+
+
+# Power-loss detection on the X1200's power status pin (GPIO 6, high while
+# plugged in) using edge callbacks instead of polling is_active in the display
+# loop. On loss it switches the UPS sampler to fast sampling and, if
+# shutdown_after is set, starts a countdown to a clean shutdown that is
+# cancelled when power comes back. on_change(ac_power) is called from
+# gpiozero's callback thread and `changed` is set, so a display loop waiting
+# on it can switch to the UPS screen right away; the loop calls frame_shown()
+# after the next frame and the edge-to-screen latency is logged.
+# pin_factory allows testing with gpiozero.pins.mock.MockFactory.
+class PowerMonitor:
+    def __init__(self, pin=6, sampler=None, on_change=None, shutdown_after=None,
+                 shutdown_command=("shutdown", "-h", "now"), fast_interval=0.25, pin_factory=None):
+        self.sampler = sampler
+        self.on_change = on_change
+        self.shutdown_after = shutdown_after
+        self.shutdown_command = shutdown_command
+        self.fast_interval = fast_interval
+        self.normal_interval = sampler.interval if sampler is not None else None
+        self.changed = threading.Event()
+        self.latency = None  # seconds from the last edge to the frame showing it
+        self._edge = None
+        self._deadline = None
+        self._timer = None
+        self.input = gpiozero.DigitalInputDevice(pin, pin_factory=pin_factory)
+        self.ac_power = self.input.is_active
+        self.input.when_activated = self._restored
+        self.input.when_deactivated = self._lost
+
+    def _lost(self):
+        self._edge = time.monotonic()
+        self.ac_power = False
+        if self.sampler is not None:
+            self.sampler.set_interval(self.fast_interval)
+        if self.shutdown_after is not None and self._timer is None:
+            self._deadline = self._edge + self.shutdown_after
+            self._timer = threading.Timer(self.shutdown_after, self._shutdown)
+            self._timer.daemon = True
+            self._timer.start()
+        self._notify()
+
+    def _restored(self):
+        self._edge = time.monotonic()
+        self.ac_power = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = self._deadline = None
+        if self.sampler is not None:
+            self.sampler.set_interval(self.normal_interval)
+        self._notify()
+
+    def _notify(self):
+        self.changed.set()
+        if self.on_change is not None:
+            self.on_change(self.ac_power)
+
+    def _shutdown(self):
+        print("UPS on battery for %g s, shutting down" % self.shutdown_after, flush=True)
+        subprocess.Popen(self.shutdown_command)
+
+    # Seconds left before shutdown while on battery, None if no countdown runs
+    def countdown(self):
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    # Call after a frame is on the display; logs the latency of a pending edge
+    def frame_shown(self):
+        edge, self._edge = self._edge, None
+        if edge is None:
+            return
+        self.latency = time.monotonic() - edge
+        print("power %s, on screen after %.1f ms" % ("restored" if self.ac_power else "lost",
+                                                      self.latency * 1000), flush=True)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self.input.close()
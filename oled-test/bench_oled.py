@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# Headless benchmark of the OLED render paths
+# Runs every stats page of dashboard.py and the GIF player from test-image.py
+# against stand-ins instead of a Pi: the adafruit displays get a busio.I2C
+# look-alike and the luma devices a recording smbus (see bench_sh1106.py) or
+# luma's own dummy device. Both only count the bytes that would go on the bus.
+#
+# For every case it prints frames/s, CPU ms per frame, bus bytes per frame and
+# the peak memory allocated while rendering a frame (tracemalloc, measured in
+# a second pass so it doesn't skew the timings). The pages show scripted
+# metric values that change on every frame, the same on every run and every
+# machine, so the rows measure real redraws and transfers, and runs can be
+# compared with --baseline.
+#
+# Usage: python3 bench_oled.py [--frames 200] [--only gif] [--json out.json]
+#                              [--baseline out.json] [--tolerance 0.25]
+# With --baseline it compares against an earlier --json run and exits with 1
+# if any case got slower, more CPU hungry or chattier on the bus by more than
+# the tolerance.
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from luma.core.device import dummy
+from luma.core.interface.serial import i2c
+from luma.oled.device import sh1106
+from PIL import Image
+from smbus2 import i2c_msg
+
+import sh1106_fast
+from bench_sh1106 import RecordingBus
+from gif_cache import GifFrames, prepare_frame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATS_DIR = os.path.join(HERE, "OLED_Stats")
+sys.path.insert(0, STATS_DIR)
+
+import adafruit_ssd1306
+import ssd1306_fast
+from dashboard import Dashboard
+
+PAGES = ("system", "stats", "network", "graph")  # "ups" needs the X1200 on the bus
+# Pages that draw with framebuf_fast methods (blit_image) plain adafruit_ssd1306 lacks
+FAST_ONLY = ("graph",)
+GIF = os.path.join(HERE, "Ignisoul-home-7.gif")
+
+
+# busio.I2C look-alike that counts bytes instead of talking to /dev/i2c-1
+class RecordingI2C:
+    def __init__(self):
+        self.bytes = 0
+        self.transactions = 0
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        self.bytes += 1 + end - start  # address + payload
+        self.transactions += 1
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        pass
+
+
+# Metric values for frame i, in the formats the pages' fetch functions
+# return; everything but the host name changes from one frame to the next
+def scripted_metrics(i):
+    mem = i * 29 % 1000 / 10
+    disk = 5 + i % 27
+    return {
+        "ip": "192.168.%d.%d" % (i % 3, 10 + i * 7 % 240),
+        "hostname": "raspberrypi",
+        "load": "%.2fLA" % (i * 37 % 400 / 100),
+        "temp": "%.1f" % (40 + i * 13 % 300 / 10),
+        "mem": "%.2f%%" % mem,
+        "disk": "%d/32GB" % disk,
+        "mem_text": "Mem: %.1f/7.8GB %.1f%%" % (mem * 0.078, mem),
+        "disk_text": "Disk: %d/32GB %d%%" % (disk, disk * 100 // 32),
+        "net": ("%.1f KB/s" % (i * 53 % 1000 / 10), "%.1f KB/s" % (i * 17 % 1000 / 10)),
+        "history": (i * 41 % 1000 / 10, 30 + i * 7 % 550 / 10, mem),
+    }
+
+
+# One dashboard page on an adafruit style SSD1306
+def page_case(name, display):
+    bus = RecordingI2C()
+    dash = Dashboard(display(128, 64, bus), [name])
+    page = dash.pages[0]
+    values = scripted_metrics(0)
+    for metric in scripted_metrics(0):
+        if metric in dash.metrics:
+            fetch = lambda metric=metric: values[metric]
+            if metric == "history":
+                # a new graph column per frame: every frame is an incremental scroll
+                fetch = lambda: page.add_sample(values["history"])
+            dash.metrics.add(metric, fetch)
+
+    # The next scripted values every frame, as the metrics cache thread would give
+    def prepare(i):
+        values.update(scripted_metrics(i))
+        dash.metrics.refresh()
+
+    return prepare, lambda i: dash.render(), bus
+
+
+def gif_frames(path):
+    gif = Image.open(path)
+    frames = []
+    try:
+        while True:
+            frames.append(gif.copy())
+            gif.seek(gif.tell() + 1)
+    except EOFError:
+        pass
+    return frames
+
+
+# The GIF player on a luma device, converting every frame as it goes
+def gif_case(device_cls):
+    frames = gif_frames(GIF)
+    if device_cls is dummy:
+        bus = None
+        device = dummy(width=128, height=64, mode="1")
+    else:
+        bus = RecordingBus()
+        serial = i2c(bus=bus)
+        # behave like i2c(port=1), which owns an smbus2 bus and uses i2c_rdwr for data
+        serial._managed = True
+        serial._i2c_msg_write = i2c_msg.write
+        device = device_cls(serial)
+
+    def render(i):
+        device.display(prepare_frame(frames[i % len(frames)], device.size))
+
+    return (lambda i: None), render, bus
+
+
+# The GIF player on sh1106_fast with frames pre-packed by gif_cache, sending
+# whole frames or only the spans that changed
+def gif_cached_case(delta):
+    bus = RecordingBus()
+    serial = i2c(bus=bus)
+    serial._managed = True
+    serial._i2c_msg_write = i2c_msg.write
+    device = sh1106_fast.sh1106(serial)
+    gif = GifFrames(GIF, device)
+
+    def render(i):
+        index = i % len(gif)
+        device.write_spans(gif.changes(index, (index - 1) % len(gif) if delta else None))
+
+    return (lambda i: None), render, bus
+
+
+CASES = [("page:%s %s" % (name, label), lambda name=name, display=display: page_case(name, display))
+         for name in PAGES
+         for label, display in (("adafruit_ssd1306", adafruit_ssd1306.SSD1306_I2C),
+                                ("ssd1306_fast", ssd1306_fast.SSD1306_I2C))
+         if name not in FAST_ONLY or display is ssd1306_fast.SSD1306_I2C]
+CASES += [("gif luma dummy", lambda: gif_case(dummy)),
+          ("gif luma sh1106", lambda: gif_case(sh1106)),
+          ("gif sh1106_fast", lambda: gif_case(sh1106_fast.sh1106)),
+          ("gif sh1106_fast cached", lambda: gif_cached_case(False)),
+          ("gif sh1106_fast cached delta", lambda: gif_cached_case(True))]
+
+
+def measure(make, frames):
+    prepare, render, bus = make()
+    prepare(0)
+    render(0)  # warm up caches, first full frame
+    if bus is not None:
+        bus.bytes = bus.transactions = 0
+
+    wall = cpu = 0.0
+    for i in range(1, frames + 1):
+        prepare(i)
+        start, start_cpu = time.perf_counter(), time.process_time()
+        render(i)
+        wall += time.perf_counter() - start
+        cpu += time.process_time() - start_cpu
+    sent = bus.bytes if bus is not None else 0
+
+    alloc = 0
+    tracemalloc.start()
+    for i in range(1, frames + 1):
+        prepare(i)
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        render(i)
+        alloc += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {"fps": frames / wall, "cpu_ms": cpu * 1000 / frames,
+            "bytes": sent / frames, "alloc_kb": alloc / 1024 / frames}
+
+
+# Metric -> True if a larger value is better
+DIRECTIONS = {"fps": True, "cpu_ms": False, "bytes": False, "alloc_kb": False}
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for case, result in results.items():
+        old = baseline.get(case)
+        if old is None:
+            continue
+        for metric, higher_is_better in DIRECTIONS.items():
+            before, after = old[metric], result[metric]
+            if higher_is_better:
+                worse = after < before * (1 - tolerance)
+            else:
+                # ignore noise on values that are near zero anyway
+                worse = after > before * (1 + tolerance) and after - before > 1
+            if worse:
+                found.append("%s: %s %.2f -> %.2f" % (case, metric, before, after))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="headless OLED render benchmark")
+    parser.add_argument("--frames", type=int, default=200, help="frames per case")
+    parser.add_argument("--only", default="", help="run only cases containing this text")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written by --json")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative change before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    json_path = args.json and os.path.abspath(args.json)
+    baseline_path = args.baseline and os.path.abspath(args.baseline)
+    os.chdir(STATS_DIR)  # fonts are loaded relative to the stats scripts
+    results = {}
+    print("%-32s %9s %9s %12s %12s" % ("", "fps", "cpu ms", "bytes/frame", "alloc KB"))
+    for case, make in CASES:
+        if args.only not in case:
+            continue
+        result = results[case] = measure(make, args.frames)
+        print("%-32s %9.1f %9.2f %12.0f %12.1f" % (case, result["fps"], result["cpu_ms"],
+                                                   result["bytes"], result["alloc_kb"]), flush=True)
+
+    if json_path:
+        with open(json_path, "w") as out:
+            json.dump(results, out, indent=1, sort_keys=True)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print("regression: " + line)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# Deadline based frame pacing for the luma animation players
+# Sleeping for a frame's duration after drawing it makes every frame as long
+# as its duration plus the conversion and transfer time, so animations run
+# slow by a varying amount. FramePacer instead puts every frame on an
+# absolute timeline (start time + sum of the previous durations) and sleeps
+# until the next frame's deadline. When it falls behind, frames whose slot is
+# already over are dropped instead of shifting everything after them, and
+# max_fps caps how often a frame is pushed, which bounds the bus load.
+#
+# It extends luma's framerate_regulator, so effective_FPS() and
+# average_transit_time() still work. Usage:
+#
+#   pacer = FramePacer(max_fps=30)
+#   for index in pacer.play(durations):
+#       with pacer:
+#           device.write_pages(frames.frame(index))
+#   print(pacer.report())
+from collections import deque
+from time import perf_counter, sleep
+
+from luma.core.sprite_system import framerate_regulator
+
+
+class FramePacer(framerate_regulator):
+    def __init__(self, max_fps=0, window=512):
+        super().__init__(fps=max_fps)
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.dropped = 0
+        self.target_fps = 0.0
+        self.lateness = deque(maxlen=window)  # push time - deadline, seconds
+        self._deadline = None  # deadline of the frame being pushed
+        self._next_deadline = None
+
+    # Yield frame indices on time for frames lasting `durations` seconds,
+    # dropping late ones; loops forever unless loops is given
+    def play(self, durations, loops=None):
+        count = len(durations)
+        total = sum(durations)
+        if not count or total <= 0:
+            return
+        self.target_fps = count / total
+        if self.min_interval:
+            self.target_fps = min(self.target_fps, 1.0 / self.min_interval)
+        starts = [0.0] * count
+        for i in range(1, count):
+            starts[i] = starts[i - 1] + durations[i - 1]
+
+        origin = perf_counter()
+        loop = 0
+        i = 0
+        while loops is None or loop < loops:
+            now = perf_counter()
+            if now - (origin + loop * total + starts[i]) > total:
+                # more than a whole loop behind, e.g. after a stall: start over from here
+                origin = now - loop * total - starts[i]
+            # Drop frames whose slot has already ended
+            while now >= origin + loop * total + starts[i] + durations[i]:
+                self.dropped += 1
+                i += 1
+                if i == count:
+                    i = 0
+                    loop += 1
+                    if loops is not None and loop >= loops:
+                        return
+            self._deadline = origin + loop * total + starts[i]
+            if i + 1 < count:
+                self._next_deadline = origin + loop * total + starts[i + 1]
+            else:
+                self._next_deadline = origin + (loop + 1) * total
+            if now < self._deadline:
+                sleep(self._deadline - now)  # only before the very first frame, later __exit__ waits
+            yield i
+            i += 1
+            if i == count:
+                i = 0
+                loop += 1
+
+    def __enter__(self):
+        super().__enter__()
+        if self._deadline is not None:
+            self.lateness.append(max(0.0, self.enter_time - self._deadline))
+        return self
+
+    # Sleep until the next frame is due, but at least min_interval after this push
+    def __exit__(self, *args):
+        self.called += 1
+        self.total_transit_time += perf_counter() - self.enter_time
+        if self._next_deadline is not None:
+            wake = max(self._next_deadline, self.enter_time + self.min_interval)
+            delay = wake - perf_counter()
+            if delay > 0:
+                sleep(delay)
+        self.last_time = perf_counter()
+
+    # Push time behind the deadline in seconds: (p50, p95, max)
+    def jitter(self):
+        if not self.lateness:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self.lateness)
+        last = len(ordered) - 1
+        return ordered[last * 50 // 100], ordered[last * 95 // 100], ordered[last]
+
+    def report(self):
+        p50, p95, peak = self.jitter()
+        return ("%.1f fps (target %.1f), %d frames, %d dropped, late p50 %.1f p95 %.1f max %.1f ms"
+                % (self.effective_FPS() if self.called else 0.0, self.target_fps, self.called,
+                   self.dropped, p50 * 1000, p95 * 1000, peak * 1000))
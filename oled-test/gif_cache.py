@@ -0,0 +1,229 @@
+# Pre-baked GIF frames for the luma players
+# Converting a GIF frame for the display (RGBA paste, resize, two mode
+# conversions) costs far more CPU than sending it, and test-image.py used to
+# do it for every frame of every loop. GifFrames converts each frame once per
+# GIF and display geometry, packs it into page bytes, stores the result in a
+# cache file and memory-maps that file on later runs. Playback then only
+# pushes precomputed bytes with sh1106_fast's write_spans().
+#
+# Consecutive animation frames usually differ in a few short runs of columns,
+# so baking also records, per frame, the spans (page, first column, length)
+# that changed since the frame before it. changes() hands out only those when
+# the previous frame was shown, and the whole frame otherwise.
+#
+# Cache files live in $XDG_CACHE_HOME/oled-gif (~/.cache/oled-gif) and are
+# named after the SHA-256 of the GIF and the geometry, so editing the GIF or
+# changing the display makes a new one. Layout: HEADER, one little endian
+# uint16 duration in ms per frame, the frames (`pages * width` bytes each),
+# one uint16 span count per frame, then all spans as 3 byte records.
+#
+# Run it on GIFs to see how many bytes per frame the spans save:
+#   python3 gif_cache.py Ignisoul-home*.gif
+import os
+import sys
+import mmap
+import struct
+import hashlib
+
+from PIL import Image
+
+from sh1106_fast import pack_pages
+
+MAGIC = b"OLEDGIF2"
+HEADER = struct.Struct("<8sHHHI")  # magic, width, height, rotate, frame count
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "oled-gif")
+DEFAULT_DURATION = 100  # ms, for GIFs without a frame duration
+SPAN = struct.Struct("BBB")  # page, first column, length
+# Unchanged columns between two changed runs of a page that are still sent to
+# keep them in one span; a separate span costs 8 bytes of addressing
+SPAN_GAP = 8
+
+
+# Convert a GIF frame to a 1-bit image of the display size
+def prepare_frame(frame, size):
+    return to_gray(frame, size).convert("1")
+
+
+# Flatten a GIF frame onto black and scale it to `size` in grayscale
+def to_gray(frame, size):
+    # Convert to RGB first (handle all modes)
+    if frame.mode == 'RGBA':
+        # Handle transparency with black background
+        background = Image.new('RGB', frame.size, (0, 0, 0))
+        background.paste(frame, mask=frame.split()[3])
+        frame = background
+    elif frame.mode == 'P':
+        # Palette mode - convert to RGBA then RGB
+        frame = frame.convert('RGBA')
+        background = Image.new('RGB', frame.size, (0, 0, 0))
+        background.paste(frame, mask=frame.split()[3])
+        frame = background
+    elif frame.mode != 'RGB':
+        # Any other mode, convert to RGB
+        frame = frame.convert('RGB')
+
+    # Ensure correct size
+    if frame.size != size:
+        frame = frame.resize(size)
+
+    return frame.convert("L")
+
+
+def cache_path(path, device, cache_dir=CACHE_DIR):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    name = "%s-%dx%d-r%d.frames" % (digest.hexdigest()[:32], device.width, device.height, device.rotate)
+    return os.path.join(cache_dir, name)
+
+
+# (page, first column, length) runs of `new` that differ from `old`, both
+# frames packed page after page
+def delta_spans(old, new, pages, width, gap=SPAN_GAP):
+    spans = []
+    for page in range(pages):
+        start = page * width
+        a = old[start:start + width]
+        b = new[start:start + width]
+        if a == b:
+            continue
+        run = None
+        for column in range(width):
+            if a[column] != b[column]:
+                if run is not None and column - run[1] <= gap:
+                    run[1] = column + 1
+                else:
+                    if run is not None:
+                        spans.append((page, run[0], run[1] - run[0]))
+                    run = [column, column + 1]
+        spans.append((page, run[0], run[1] - run[0]))
+    return spans
+
+
+# Decode and convert every frame, returns the cache file contents
+def bake(path, device):
+    gif = Image.open(path)
+    durations = []
+    frames = []
+    try:
+        while True:
+            frame = device.preprocess(prepare_frame(gif.copy(), device.size))
+            frames.append(b"".join(pack_pages(frame)))
+            durations.append(min(gif.info.get("duration", DEFAULT_DURATION), 0xFFFF))
+            gif.seek(gif.tell() + 1)
+    except EOFError:
+        pass
+    pages = device.height // 8
+    # spans against the frame before, the first frame against the last for looping
+    spans = [delta_spans(frames[i - 1], frame, pages, device.width) for i, frame in enumerate(frames)]
+
+    header = HEADER.pack(MAGIC, device.width, device.height, device.rotate, len(frames))
+    return b"".join([header, struct.pack("<%dH" % len(frames), *durations), *frames,
+                     struct.pack("<%dH" % len(spans), *map(len, spans)),
+                     *(SPAN.pack(*span) for frame_spans in spans for span in frame_spans)])
+
+
+# frame() and changes() over pre-packed frames: subclasses fill _frames with
+# (page, bytes) lists, _full with the same as spans and _spans with the deltas
+class PackedFramesMixin:
+    # (page, page bytes) pairs of frame i, as write_pages() takes them
+    def frame(self, i):
+        return self._frames[i]
+
+    # (page, column, bytes) spans that turn the display into frame i, as
+    # write_spans() takes them: only the changes if `previous` is the frame
+    # before i, all of frame i otherwise (first frame, after dropped frames)
+    def changes(self, i, previous=None):
+        if previous is not None and previous == (i - 1) % len(self._spans):
+            return self._spans[i]
+        return self._full[i]
+
+
+class GifFrames(PackedFramesMixin):
+    def __init__(self, path, device, cache_dir=CACHE_DIR):
+        self.width = device.width
+        self.pages = device.height // 8
+        self.frame_size = self.pages * self.width
+        self.path = cache_path(path, device, cache_dir)
+        self.baked = False  # True if the cache file was (re)built on this run
+
+        self._map = self._open(device)
+        if self._map is None:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = "%s.%d.tmp" % (self.path, os.getpid())
+            with open(tmp, "wb") as f:
+                f.write(bake(path, device))
+            os.replace(tmp, self.path)
+            self.baked = True
+            self._map = self._open(device)
+
+        count = HEADER.unpack_from(self._map)[4]
+        self.durations = [ms / 1000 for ms in struct.unpack_from("<%dH" % count, self._map, HEADER.size)]
+        self._view = memoryview(self._map)
+        offset = HEADER.size + 2 * count
+        width = self.width
+        starts = range(offset, offset + count * self.frame_size, self.frame_size)
+        self._frames = [[(page, self._view[start + page * width:start + (page + 1) * width])
+                         for page in range(self.pages)]
+                        for start in starts]
+        self._full = [[(page, 0, data) for page, data in frame] for frame in self._frames]
+
+        offset += count * self.frame_size
+        span_counts = struct.unpack_from("<%dH" % count, self._map, offset)
+        offset += 2 * count
+        self._spans = []
+        for start, span_count in zip(starts, span_counts):
+            spans = []
+            for page, column, length in SPAN.iter_unpack(self._map[offset:offset + span_count * SPAN.size]):
+                data_start = start + page * width + column
+                spans.append((page, column, self._view[data_start:data_start + length]))
+            self._spans.append(spans)
+            offset += span_count * SPAN.size
+
+    # Memory-map an existing, complete cache file, None if there is none
+    def _open(self, device):
+        try:
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None  # ValueError: empty file
+        if len(mapped) >= HEADER.size:
+            magic, width, height, rotate, count = HEADER.unpack_from(mapped)
+            offset = HEADER.size + count * (2 + self.frame_size)
+            if (magic, width, height, rotate) == (MAGIC, device.width, device.height, device.rotate) \
+                    and len(mapped) >= offset + 2 * count:
+                spans = sum(struct.unpack_from("<%dH" % count, mapped, offset))
+                if len(mapped) == offset + 2 * count + spans * SPAN.size:
+                    return mapped
+        mapped.close()
+        return None
+
+    def __len__(self):
+        return len(self.durations)
+
+    def close(self):
+        self._frames = self._full = self._spans = None
+        self._view.release()
+        self._map.close()
+
+
+# Bytes on the bus per frame for whole frames and for changed spans only,
+# as sh1106_fast sends them over i2c_rdwr (7 bytes of commands per page/span)
+def main(argv):
+    from luma.core.device import dummy
+
+    device = dummy(width=128, height=64, mode="1")
+    print("%-24s %7s %12s %12s" % ("", "frames", "full B/frame", "delta B/frame"))
+    for path in argv:
+        frames = GifFrames(path, device)
+        count = len(frames)
+        full = sum(7 + len(data) for i in range(count) for _, _, data in frames.changes(i))
+        delta = sum(7 + len(data) for i in range(count) for _, _, data in frames.changes(i, (i - 1) % count))
+        print("%-24s %7d %12.0f %12.0f" % (os.path.basename(path), count, full / count, delta / count))
+        frames.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,6 +1,6 @@
 from luma.core.interface.serial import i2c
 from luma.core.render import canvas
-from luma.oled.device import sh1106
+from sh1106_fast import sh1106  # luma sh1106 with bulk page packing
 from PIL import ImageFont
 import time
 
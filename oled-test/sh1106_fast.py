@@ -0,0 +1,74 @@
+# Faster luma.oled sh1106 device
+# display() packs the whole image into page bytes in bulk instead of indexing
+# image.getdata() eight times per column, and when the bus supports i2c_rdwr
+# (smbus2, the luma default) each page goes out as a single I2C message that
+# carries the page/column address commands and the page data together.
+# The pages are handed to the kernel in as few i2c_rdwr calls as its
+# message limit allows (one for a full frame).
+from luma.oled.device import sh1106 as luma_sh1106
+from PIL import Image
+
+try:
+    from smbus2 import i2c_msg
+except ImportError:
+    i2c_msg = None
+
+SET_PAGE_ADDRESS = 0xB0
+# SH1106 RAM is 132 columns wide, the 128 visible ones start at column 2
+COLUMN_OFFSET = 2
+# Linux rejects an I2C_RDWR ioctl with more messages than this (EINVAL)
+I2C_RDWR_MAX_MSGS = 42
+
+
+# Pack a mode "1" image into MVLSB page bytes, one bytes object per page.
+# Transposing turns every column into a row, and the "1;R" raw mode packs
+# 8 pixels per byte with the topmost pixel in bit 0, which is one page byte.
+def pack_pages(image):
+    pages = image.height // 8
+    data = image.transpose(Image.Transpose.TRANSPOSE).tobytes("raw", "1;R")
+    return [data[page::pages] for page in range(pages)]
+
+
+class sh1106(luma_sh1106):
+    def __init__(self, serial_interface=None, width=128, height=64, rotate=0, **kwargs):
+        # The base constructor already clears the display, so set up state first
+        self.bytes_sent = 0
+        self._rdwr = None
+        bus = getattr(serial_interface, "_bus", None)
+        if i2c_msg is not None and getattr(bus, "i2c_rdwr", None) is not None:
+            self._rdwr = bus.i2c_rdwr
+        super().__init__(serial_interface, width=width, height=height, rotate=rotate, **kwargs)
+
+    def display(self, image):
+        assert image.mode == self.mode
+        assert image.size == self.size
+
+        image = self.preprocess(image)
+        self.write_pages(enumerate(pack_pages(image)))
+
+    # Write (page number, page bytes) pairs starting at the given column
+    def write_pages(self, pages, column=0):
+        self.write_spans((page, column, data) for page, data in pages)
+
+    # Write (page number, first column, bytes) spans, e.g. only the parts of
+    # a frame that changed
+    def write_spans(self, spans):
+        if self._rdwr is not None:
+            addr = self._serial_interface._addr
+            msgs = []
+            for page, column, data in spans:
+                column += COLUMN_OFFSET
+                # Co=1 control byte before each command, then Co=0 D/C#=1 for the data
+                msg = bytes((0x80, SET_PAGE_ADDRESS + page, 0x80, column & 0x0F, 0x80, 0x10 | (column >> 4),
+                             0x40)) + bytes(data)
+                msgs.append(i2c_msg.write(addr, msg))
+                self.bytes_sent += len(msg)
+            for i in range(0, len(msgs), I2C_RDWR_MAX_MSGS):
+                self._rdwr(*msgs[i:i + I2C_RDWR_MAX_MSGS])
+        else:
+            for page, column, data in spans:
+                column += COLUMN_OFFSET
+                self.command(SET_PAGE_ADDRESS + page, column & 0x0F, 0x10 | (column >> 4))
+                self.data(data)
+                # one control byte per command write and per 32 byte data block
+                self.bytes_sent += 4 + len(data) + -(-len(data) // 32)
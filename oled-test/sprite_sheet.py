@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# Offline GIF/video to 1-bit sprite sheet conversion
+# Converting and dithering animation frames is the expensive part of playing
+# them, so do it once on a desktop machine instead of on the Pi:
+#
+#   python3 sprite_sheet.py Ignisoul.gif Ignisoul.png --dither bayer
+#   python3 sprite_sheet.py clip.mp4 clip.png --fps 15   (videos need ffmpeg)
+#
+# The output is a 1-bit PNG with the frames stacked top to bottom, which
+# luma.core.sprite_system.spritesheet can use as is. The frame geometry and
+# the per-frame durations are kept in a text chunk of the same file, so
+# SpriteSheet needs nothing else and playback never touches the image
+# conversion code. Dithering:
+#   floyd      Floyd-Steinberg error diffusion (PIL's C implementation)
+#   bayer      ordered dithering with an 8x8 Bayer matrix
+#   threshold  plain threshold at --level
+import sys
+import json
+import argparse
+import subprocess
+
+from PIL import Image, ImageChops, PngImagePlugin
+from luma.core.sprite_system import spritesheet
+
+from gif_cache import to_gray, delta_spans, PackedFramesMixin, DEFAULT_DURATION
+from sh1106_fast import pack_pages
+
+METADATA_KEY = "oled-sprites"
+
+
+# n x n Bayer matrix thresholds as an "L" image, n a power of two
+def bayer_tile(n=8):
+    matrix = [[0]]
+    while len(matrix) < n:
+        size = len(matrix)
+        matrix = [[4 * matrix[y % size][x % size] + (0, 2, 3, 1)[(y // size) * 2 + x // size]
+                   for x in range(2 * size)] for y in range(2 * size)]
+    tile = Image.new("L", (n, n))
+    tile.putdata([int((value + 0.5) * 256 / (n * n)) for row in matrix for value in row])
+    return tile
+
+
+_thresholds = {}
+
+
+def ordered_dither(gray, n=8):
+    thresholds = _thresholds.get((gray.size, n))
+    if thresholds is None:
+        tile = bayer_tile(n)
+        thresholds = Image.new("L", gray.size)
+        for y in range(0, gray.height, n):
+            for x in range(0, gray.width, n):
+                thresholds.paste(tile, (x, y))
+        _thresholds[(gray.size, n)] = thresholds
+    # pixels brighter than their threshold are lit
+    return ImageChops.subtract(gray, thresholds).point(lambda v: 255 if v else 0, "1")
+
+
+def dither(gray, method="floyd", level=128):
+    if method == "floyd":
+        return gray.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
+    if method == "bayer":
+        return ordered_dither(gray)
+    if method == "threshold":
+        return gray.point(lambda v: 255 if v >= level else 0, "1")
+    raise ValueError("unknown dither method " + method)
+
+
+# (grayscale frame, duration in ms) for every frame of a GIF/APNG/WebP
+def image_frames(path, size):
+    image = Image.open(path)
+    try:
+        while True:
+            yield to_gray(image.copy(), size), image.info.get("duration", DEFAULT_DURATION)
+            image.seek(image.tell() + 1)
+    except EOFError:
+        pass
+
+
+# (grayscale frame, duration in ms) for every frame of a video, decoded by ffmpeg
+def video_frames(path, size, fps):
+    width, height = size
+    command = ["ffmpeg", "-v", "error", "-i", path, "-vf", "fps=%g,scale=%d:%d" % (fps, width, height),
+               "-f", "rawvideo", "-pix_fmt", "gray", "-"]
+    ffmpeg = subprocess.Popen(command, stdout=subprocess.PIPE)
+    frame_size = width * height
+    try:
+        while True:
+            data = ffmpeg.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break
+            yield Image.frombytes("L", size, data), round(1000 / fps)
+    finally:
+        ffmpeg.stdout.close()
+        if ffmpeg.wait():
+            raise RuntimeError("ffmpeg failed on " + path)
+
+
+def convert(frames, size, method="floyd", level=128):
+    width, height = size
+    images = []
+    durations = []
+    for gray, duration in frames:
+        images.append(dither(gray, method, level))
+        durations.append(duration)
+    sheet = Image.new("1", (width, height * len(images)))
+    for i, image in enumerate(images):
+        sheet.paste(image, (0, i * height))
+    return sheet, durations
+
+
+def save(path, sheet, size, durations):
+    info = PngImagePlugin.PngInfo()
+    info.add_text(METADATA_KEY, json.dumps({"width": size[0], "height": size[1],
+                                            "count": len(durations), "durations": durations}))
+    sheet.save(path, "PNG", pnginfo=info, optimize=True)
+
+
+# A sprite sheet written by this tool for `device`. It is a luma spritesheet
+# with one looping animation ("play") over all frames, and also offers the
+# GifFrames interface (len(), durations in seconds, frame() and changes())
+# for sh1106_fast, with every frame rotated by device.preprocess() and packed
+# once at load time.
+class SpriteSheet(PackedFramesMixin, spritesheet):
+    def __init__(self, path, device):
+        # the metadata is a text chunk ahead of the image data, read without decoding it
+        with Image.open(path) as image:
+            meta = json.loads(image.info[METADATA_KEY])
+        width, height, count = meta["width"], meta["height"], meta["count"]
+        if (width, height) != device.size:
+            raise ValueError("%s has %dx%d frames, the display is %dx%d"
+                             % (path, width, height, device.width, device.height))
+        super().__init__(path, {"width": width, "height": height, "count": count},
+                         {"play": {"frames": list(range(count)), "next": "play"}})
+
+        self.durations = [ms / 1000 for ms in meta["durations"]]
+        physical = [device.preprocess(self[i]) for i in range(count)]
+        width = physical[0].width  # columns of the panel, whatever the rotation
+        pages = physical[0].height // 8
+        packed = [b"".join(pack_pages(frame)) for frame in physical]
+        self._frames = [[(page, frame[page * width:(page + 1) * width]) for page in range(pages)]
+                        for frame in packed]
+        self._full = [[(page, 0, data) for page, data in frame] for frame in self._frames]
+        self._spans = [[(page, column, frame[page * width + column:page * width + column + length])
+                        for page, column, length in delta_spans(packed[i - 1], frame, pages, width)]
+                       for i, frame in enumerate(packed)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="convert a GIF or video to a 1-bit OLED sprite sheet")
+    parser.add_argument("input", help="GIF (or any animated image PIL reads) or video file")
+    parser.add_argument("output", help="sprite sheet PNG to write")
+    parser.add_argument("--size", default="128x64", help="frame size, WIDTHxHEIGHT")
+    parser.add_argument("--dither", choices=("floyd", "bayer", "threshold"), default="floyd")
+    parser.add_argument("--level", type=int, default=128, help="threshold for --dither threshold")
+    parser.add_argument("--fps", type=float, default=15, help="frame rate to sample videos at")
+    args = parser.parse_args(argv)
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    try:
+        Image.open(args.input).close()
+        frames = image_frames(args.input, size)
+    except OSError:
+        frames = video_frames(args.input, size, args.fps)
+
+    sheet, durations = convert(frames, size, args.dither, args.level)
+    if not durations:
+        parser.error("no frames in " + args.input)
+    save(args.output, sheet, size, durations)
+    print("%s: %d frames, %dx%d, %d ms total" % (args.output, len(durations), size[0], size[1],
+                                                  sum(durations)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,31 @@
+import time
+
+# the helpers are imported from the OLED_Stats folder next to this script
+from OLED_Stats import platform_cache  # Blinka platform from the cache, before anything imports board or busio
+platform_cache.load()
 import board
 import busio
 import adafruit_ssd1306
-import time
+from OLED_Stats import framebuf_fast
+
+
+# adafruit_ssd1306 with framebuf_fast's drawing, text() from the preloaded font
+class SSD1306_I2C(framebuf_fast.FastFrameBufferMixin, adafruit_ssd1306.SSD1306_I2C):
+    pass
+
 
 i2c = busio.I2C(board.SCL, board.SDA)
-oled = adafruit_ssd1306.SSD1306_I2C(128, 64, i2c, addr=0x3C)
+oled = SSD1306_I2C(128, 64, i2c, addr=0x3C)
+
+# Keep font5x8.bin in memory; text() at a y divisible by 8 then copies whole page rows
+framebuf_fast.preload_font("font5x8.bin")
 
 while True:
     oled.fill(0)
     # Clear screen
     oled.text('OLED IS WORKING',0, 0, 1)
-    oled.text('Address: 0x3C', 0, 15, 1)
-    oled.text('Raspberry Pi', 0, 30, 1)
+    oled.text('Address: 0x3C', 0, 16, 1)
+    oled.text('Raspberry Pi', 0, 32, 1)
     oled.show()
     oled.sleep(2)
 
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# Scrolling text ticker for luma SSD1306/SH1106 panels
+# Text that doesn't fit the 128 px width (IP addresses, hostnames, status
+# messages) scrolls through a band of 8 pixel pages. On an SSD1306 the band
+# is written once and then scrolled by the controller's continuous horizontal
+# scroll (0x26/0x27 setup, 0x2F activate, 0x2E deactivate), so nothing goes
+# over the bus until the ticker stops. The controller rotates its 128 RAM
+# columns, so this works for strips (text plus gap) up to 128 px wide, and
+# the step rate is the frame rate (roughly FOSC_HZ / 66 / rows) divided by
+# one of a few fixed intervals.
+#
+# Longer strips would need new columns written as they scroll in, but the
+# datasheet allows no RAM access (and no change to the scroll setup) while
+# scrolling is active, and the step timing only follows the nominal
+# oscillator, so it couldn't be tracked from the host anyway. The SH1106 has
+# no scroll commands at all. Everywhere else the pre-rendered strip goes into
+# a luma.core.virtual.viewport that is moved one step at a time, which sends
+# the whole frame for every step. stats() reports the bytes written to the
+# bus per second in either mode:
+#
+#   ticker = Ticker(device, "192.168.100.200  raspberrypi.local", top=48)
+#   ticker.start()
+#   while True:
+#       ticker.tick()  # only needed in viewport mode
+#       time.sleep(0.01)
+#
+#   python3 ticker.py "some long status message" --driver ssd1306 --top 24
+import os
+import sys
+import time
+import argparse
+
+from PIL import Image, ImageDraw, ImageFont
+from luma.core.virtual import viewport
+from luma.oled.device import ssd1306
+
+FONT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "OLED_Stats", "PixelOperator.ttf")
+
+HARDWARE = "hardware"
+VIEWPORT = "viewport"
+
+RIGHT_HORIZONTAL_SCROLL = 0x26
+LEFT_HORIZONTAL_SCROLL = 0x27
+DEACTIVATE_SCROLL = 0x2E
+ACTIVATE_SCROLL = 0x2F
+RAM_COLUMNS = 128
+# Typical SSD1306 oscillator at luma's clock divide setting (0x80); with
+# luma's precharge (0xF1) a row takes 50 + 1 + 15 clocks
+FOSC_HZ = 370000
+ROW_CLOCKS = 66
+# Frames between scroll steps -> the 3 bit interval code of the setup command
+SCROLL_INTERVALS = {2: 0b111, 3: 0b100, 4: 0b101, 5: 0b000, 25: 0b110, 64: 0b001, 128: 0b010, 256: 0b011}
+
+
+# Counts the bytes written to the display's bus (control bytes included,
+# address bytes not). sh1106_fast devices count their own writes, luma's
+# i2c interface is counted by wrapping its bus's write methods.
+class BusMeter:
+    def __init__(self, device):
+        self.device = device
+        self._bytes = 0
+        if hasattr(device, "bytes_sent"):
+            return
+        bus = getattr(getattr(device, "_serial_interface", None), "_bus", None)
+        if bus is None:
+            self._bytes = None  # not an I2C device, nothing to count
+            return
+        write_block, rdwr = bus.write_i2c_block_data, getattr(bus, "i2c_rdwr", None)
+
+        def write_i2c_block_data(addr, register, data, *args):
+            self._bytes += 1 + len(data)
+            return write_block(addr, register, data, *args)
+
+        def i2c_rdwr(*msgs):
+            self._bytes += sum(len(msg) for msg in msgs)
+            return rdwr(*msgs)
+
+        bus.write_i2c_block_data = write_i2c_block_data
+        if rdwr is not None:
+            bus.i2c_rdwr = i2c_rdwr
+
+    # Bytes written so far, None if they can't be counted
+    def total(self):
+        if self._bytes is None:
+            return None
+        return getattr(self.device, "bytes_sent", self._bytes)
+
+
+# luma device stand-in of the band's size for the viewport: every band image
+# is pasted into the full frame, which then goes to the real device
+class _Band:
+    def __init__(self, device, frame, top, height):
+        self.device = device
+        self.frame = frame
+        self.top = top
+        self.mode = device.mode
+        self.width = device.width
+        self.height = height
+        self.size = (self.width, height)
+
+    def display(self, image):
+        self.frame.paste(image, (0, self.top))
+        self.device.display(self.frame)
+
+
+class Ticker:
+    # text scrolls right to left through the pages from `top` down, at about
+    # `speed` pixels per second, followed by `gap` blank pixels. `background`
+    # is the full frame the band is drawn into (blank by default).
+    # hardware=None scrolls in hardware where the device supports it,
+    # False always uses the viewport.
+    def __init__(self, device, text, font=None, top=0, gap=32, speed=30, background=None, hardware=None):
+        self.device = device
+        self.font = font or ImageFont.truetype(FONT, 16)
+        self.top = top - top % 8
+        self.speed = speed
+        self.frame = background.copy() if background is not None else Image.new(device.mode, device.size)
+        self.strip = self.render(text, gap)
+        self.meter = BusMeter(device)
+        if hardware is None:
+            hardware = self.hardware_capable()
+        self.mode = HARDWARE if hardware else VIEWPORT
+        self.virtual = None
+        self.position = 0
+        self.started = None
+        self.setup_bytes = 0
+        self._start_bytes = None
+
+    # The text and the gap after it, as a mode "1" image a whole number of
+    # pages high
+    def render(self, text, gap):
+        bottom = self.font.getbbox(text)[3]
+        width = int(round(self.font.getlength(text))) + gap
+        height = min(-(-bottom // 8) * 8, self.device.height - self.top)
+        strip = Image.new("1", (max(width, 1), max(height, 8)))
+        ImageDraw.Draw(strip).text((0, 0), text, font=self.font, fill=255)
+        return strip
+
+    def hardware_capable(self):
+        device = self.device
+        return (isinstance(device, ssd1306) and device.width == RAM_COLUMNS and device.rotate in (0, 2)
+                and self.strip.width <= RAM_COLUMNS)
+
+    # Steps per second the controller can scroll at, and the setup command's
+    # interval code for the one closest to `speed`
+    def hardware_rate(self):
+        frame_hz = FOSC_HZ / ROW_CLOCKS / self.device.height
+        frames = min(SCROLL_INTERVALS, key=lambda frames: abs(frames * self.speed - frame_hz) / frames)
+        return frame_hz / frames, SCROLL_INTERVALS[frames]
+
+    def start(self):
+        before = self.meter.total()
+        if self.mode == HARDWARE:
+            self._start_hardware()
+        else:
+            self._start_viewport()
+        after = self.meter.total()
+        if after is not None:
+            self.setup_bytes = after - before
+        self._start_bytes = after
+        self.started = time.perf_counter()
+
+    def _start_hardware(self):
+        device = self.device
+        # the strip repeats every 128 columns, the width of the rotated RAM
+        band = Image.new("1", (RAM_COLUMNS, self.strip.height))
+        band.paste(self.strip, (0, 0))
+        self.frame.paste(band.convert(self.frame.mode), (0, self.top))
+        # RAM must not be written while the controller scrolls
+        device.command(DEACTIVATE_SCROLL)
+        device.display(self.frame)
+        first = self.top // 8
+        last = (self.top + self.strip.height) // 8 - 1
+        command = LEFT_HORIZONTAL_SCROLL
+        if device.rotate == 2:
+            # upside down, the controller's pages and directions are reversed
+            pages = device.height // 8
+            first, last = pages - 1 - last, pages - 1 - first
+            command = RIGHT_HORIZONTAL_SCROLL
+        device.command(command, 0x00, first, self.hardware_rate()[1], last, 0x00, 0xFF)
+        device.command(ACTIVATE_SCROLL)
+
+    def _start_viewport(self):
+        band = _Band(self.device, self.frame, self.top, self.strip.height)
+        # two copies of the strip side by side (more if it is narrower than
+        # the panel), so every position up to the strip width shows a full band
+        copies = -(-band.width // self.strip.width) + 1
+        tiled = Image.new(self.device.mode, (self.strip.width * copies, self.strip.height))
+        for i in range(copies):
+            tiled.paste(self.strip.convert(self.device.mode), (i * self.strip.width, 0))
+        self.virtual = viewport(band, width=tiled.width, height=tiled.height)
+        self.position = 0
+        self.virtual.display(tiled)
+
+    # Move the viewport to where the text should be by now; sends a frame
+    # when it moved. Nothing to do in hardware mode.
+    def tick(self):
+        if self.virtual is None or self.started is None:
+            return False
+        position = int((time.perf_counter() - self.started) * self.speed) % self.strip.width
+        if position == self.position:
+            return False
+        self.position = position
+        self.virtual.set_position((position, 0))
+        return True
+
+    def stop(self):
+        if self.mode == HARDWARE and self.started is not None:
+            # the RAM is garbled after deactivating, so rewrite the frame
+            self.device.command(DEACTIVATE_SCROLL)
+            self.device.display(self.frame)
+        self.started = None
+
+    # Seconds until the next viewport step, for callers that sleep between ticks
+    def next_timeout(self):
+        if self.virtual is None or self.started is None:
+            return None
+        elapsed = (time.perf_counter() - self.started) * self.speed
+        return (int(elapsed) + 1 - elapsed) / self.speed
+
+    def bytes_per_second(self):
+        total = self.meter.total()
+        if total is None or self.started is None:
+            return None
+        elapsed = time.perf_counter() - self.started
+        return (total - self._start_bytes) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        rate = self.bytes_per_second()
+        speed = self.hardware_rate()[0] if self.mode == HARDWARE else self.speed
+        return {"mode": self.mode, "strip_width": self.strip.width, "pixels_per_second": round(speed, 1),
+                "setup_bytes": self.setup_bytes,
+                "bytes_per_second": None if rate is None else round(rate)}
+
+
+def open_device(driver, port, address, rotate):
+    from luma.core.interface.serial import i2c
+
+    serial = i2c(port=port, address=address)
+    if driver == "sh1106":
+        from sh1106_fast import sh1106
+        return sh1106(serial, rotate=rotate)
+    return ssd1306(serial, rotate=rotate)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="scroll text across an SSD1306/SH1106 panel")
+    parser.add_argument("text")
+    parser.add_argument("--driver", choices=("ssd1306", "sh1106"), default="sh1106")
+    parser.add_argument("--port", type=int, default=1)
+    parser.add_argument("--address", type=lambda v: int(v, 0), default=0x3C)
+    parser.add_argument("--rotate", type=int, default=0)
+    parser.add_argument("--top", type=int, default=0, help="top row of the band, rounded down to a page")
+    parser.add_argument("--size", type=int, default=16, help="font size in pixels")
+    parser.add_argument("--speed", type=float, default=30, help="pixels per second")
+    parser.add_argument("--software", action="store_true", help="use the viewport even on an SSD1306")
+    parser.add_argument("--seconds", type=float, default=10, help="how long to scroll")
+    args = parser.parse_args(argv)
+
+    device = open_device(args.driver, args.port, args.address, args.rotate)
+    ticker = Ticker(device, args.text, font=ImageFont.truetype(FONT, args.size), top=args.top,
+                    speed=args.speed, hardware=False if args.software else None)
+    ticker.start()
+    end = time.perf_counter() + args.seconds
+    try:
+        while time.perf_counter() < end:
+            ticker.tick()
+            timeout = ticker.next_timeout()
+            time.sleep(min(timeout if timeout is not None else 0.5, max(end - time.perf_counter(), 0)))
+    except KeyboardInterrupt:
+        pass
+    print(ticker.stats())
+    ticker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())